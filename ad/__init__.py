@@ -1,7 +1,8 @@
 from .shortcut import *     # noqa: F403,F401
 from .ops import *     # noqa: F403,F401
 from .graph import Graph      # noqa: F401
-from .session import Session    # noqa: F401
+from .session import Session, Batcher    # noqa: F401
+from .profiler import Profiler    # noqa: F401
 
 
 def init():
@@ -1,8 +1,22 @@
 def dfs(in_node, visited):
-    for node in in_node._input_nodes:
-        if node not in visited:
-            dfs(node, visited)
-    visited.append(in_node)
+    """
+    Iterative post order dfs along input nodes, append nodes to visited,
+    inputs always come before the nodes consume them.
+    """
+    seen = set(id(node) for node in visited)
+    seen.add(id(in_node))
+    stack = [(in_node, iter(in_node._input_nodes))]
+
+    while stack:
+        node, input_nodes = stack[-1]
+        for input_node in input_nodes:
+            if id(input_node) not in seen:
+                seen.add(id(input_node))
+                stack.append((input_node, iter(input_node._input_nodes)))
+                break
+        else:
+            stack.pop()
+            visited.append(node)
 
 
 def topsort(root):
@@ -0,0 +1,171 @@
+import math
+import numpy as np
+from . import error
+from .compiler import LOAD
+from .graph import DefaultGraphSet
+from .utils import flatten_iterable
+
+
+class CheckpointedGradient(object):
+    def __init__(self, root, wrt=None, checkpoints=None):
+        """
+        Numeric reverse pass keeping the values of checkpoint nodes
+        only, every sqrt(n) operators by default. The forward pass
+        frees other values after their last use, the backward pass
+        walks segments between checkpoints from the root and
+        recomputes the values of a segment from the checkpoints.
+        No gradient graph is built.
+        """
+        if wrt is None:
+            wrt = root.trainable_parameters()
+        self.root = root
+        self.wrt = flatten_iterable(wrt)
+        self.tape = tape = DefaultGraphSet().find_set_graph(root).tape
+        instructions = tape.instructions
+        num_slots = tape.num_slots
+
+        self.is_leaf = [opcode == LOAD for opcode, _, _, _ in instructions]
+        if checkpoints is None:
+            operators = [out for opcode, out, _, _ in instructions
+                         if opcode != LOAD]
+            step = max(1, int(math.sqrt(len(operators))))
+            kept = set(operators[step - 1::step])
+        else:
+            kept = set()
+            for node in flatten_iterable(checkpoints):
+                if node not in tape.slot_of:
+                    raise error.GraphError(
+                        f'Checkpoint {node.name} not in the graph.')
+                kept.add(tape.slot_of[node])
+        kept.add(num_slots - 1)
+        self.checkpoints = sorted(kept)
+
+        # nodes on a path from a wrt node, only they get gradients
+        self.wrt_slots = [tape.slot_of.get(node) for node in self.wrt]
+        reach = [False] * num_slots
+        for out in self.wrt_slots:
+            if out is not None:
+                reach[out] = True
+        for opcode, out, _, args in instructions:
+            if opcode != LOAD and any(reach[i] for i in args):
+                reach[out] = True
+        self.reach = reach
+
+        self.last_use = list(range(num_slots))
+        for _, out, _, args in instructions:
+            for i in args:
+                self.last_use[i] = out
+        # the most intermediate values held at once by the last call
+        self.max_live = 0
+
+    def value_of(self, index, kept, cache):
+        """
+        Value of a slot, recompute it and the missing values it
+        depends on into cache.
+        """
+        instructions = self.tape.instructions
+        outputs = self.tape.outputs
+
+        def available(i):
+            return self.is_leaf[i] or i in kept or i in cache
+
+        def get(i):
+            if i in kept:
+                return kept[i]
+            if self.is_leaf[i]:
+                return outputs[i].value
+            return cache[i]
+
+        stack = [index]
+        while stack:
+            i = stack[-1]
+            if available(i):
+                stack.pop()
+                continue
+            _, _, fn, args = instructions[i]
+            missing = [arg for arg in args if not available(arg)]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            cache[i] = fn(*[get(arg) for arg in args])
+        self.max_live = max(self.max_live, len(kept) + len(cache))
+        return get(index)
+
+    def forward(self, fed):
+        # fed values are kept along with the checkpoints, other leaves
+        # are read from their nodes
+        instructions = self.tape.instructions
+        outputs = self.tape.outputs
+        kept = set(self.checkpoints).union(fed)
+        values = dict(fed)
+        for opcode, out, fn, args in instructions:
+            if opcode == LOAD:
+                continue
+            values[out] = fn(*[values[i] if i in values
+                               else outputs[i].value for i in args])
+            self.max_live = max(self.max_live, len(values))
+            for i in args:
+                if self.last_use[i] == out and i not in kept:
+                    values.pop(i, None)
+        return {i: value for i, value in values.items() if i in kept}
+
+    def __call__(self, feed_dict=None):
+        """
+        Return the value of root and the gradients of wrt nodes.
+        """
+        tape = self.tape
+        fed = tape.feed(feed_dict or {})
+        self.max_live = 0
+
+        kept = self.forward(fed)
+        root_index = tape.num_slots - 1
+        value = self.value_of(root_index, kept, {})
+        if isinstance(value, (tuple, list)):
+            seed = [np.ones_like(v) for v in value]
+        else:
+            seed = np.ones_like(value)
+
+        adjoints = {root_index: seed}
+        wrt_slots = set(self.wrt_slots)
+        bounds = [-1] + self.checkpoints
+        for s in range(len(bounds) - 1, 0, -1):
+            cache = {}
+            for index in range(bounds[s], bounds[s - 1], -1):
+                if self.is_leaf[index] or not self.reach[index]:
+                    continue
+                grad = adjoints.get(index)
+                if grad is None:
+                    continue
+                if index not in wrt_slots:
+                    del adjoints[index]
+
+                args = tape.instructions[index][3]
+                input_values = [self.value_of(i, kept, cache) for i in args]
+                output = self.value_of(index, kept, cache)
+                input_grads = tape.outputs[index].vjp(
+                    output, input_values, grad, [self.reach[i] for i in args])
+                for i, input_grad in zip(args, input_grads):
+                    if input_grad is None:
+                        continue
+                    if i in adjoints:
+                        adjoints[i] = adjoints[i] + input_grad
+                    else:
+                        adjoints[i] = input_grad
+
+        grads = []
+        for node, out in zip(self.wrt, self.wrt_slots):
+            grad = adjoints.get(out)
+            if grad is None:
+                # root not depends on node
+                grad = np.zeros_like(node.value)
+            grads.append(grad)
+        return value, grads
+
+
+def checkpointed_grad(root, wrt=None, feed_dict=None, checkpoints=None):
+    """
+    Value of root and gradients of wrt nodes with memory bounded by
+    checkpoints, use CheckpointedGradient to reuse the plan.
+    """
+    return CheckpointedGradient(root, wrt, checkpoints)(feed_dict)
@@ -0,0 +1,286 @@
+import threading
+import time
+import numpy as np
+from . import ops
+
+
+# op codes
+LOAD = 0    # read the value of a leaf node
+CALL1 = 1   # unary operator
+CALL2 = 2   # binary operator
+CALLN = 3   # n-ary operator
+
+# dead buffers kept for reuse per shape and dtype, others are freed
+MAX_FREE_BUFFERS = 2
+
+
+class Tape(object):
+    def __init__(self, instructions, placeholders, outputs, root):
+        """
+        A flat instruction tape compiled from sorted nodes,
+        an instruction is (op code, out slot, callable, input slots),
+        instruction i writes slot i.
+        """
+        self.instructions = instructions
+        self.placeholders = placeholders
+        self.outputs = outputs
+        self.root = root
+        self.num_slots = len(outputs)
+        self.slot_of = {node: out for out, node in enumerate(outputs)}
+        self.leaves = [(out, fn) for opcode, out, fn, _ in instructions
+                       if opcode == LOAD]
+        # fed values go into the slots of a run, not into the placeholders
+        fed = {self.slot_of[node] for node in placeholders}
+        self.replayed = [out for out in range(self.num_slots)
+                         if out not in fed]
+        self.consumers = [[] for _ in range(self.num_slots)]
+        # dependency level, instructions of a level are independent
+        self.levels = [0] * self.num_slots
+        for opcode, out, _, args in instructions:
+            for i in args:
+                self.consumers[i].append(out)
+                self.levels[out] = max(self.levels[out], self.levels[i] + 1)
+
+        # held by a run, for the slots of the last run
+        self.lock = threading.RLock()
+        # values and leaf versions of the last run
+        self.slots = [None] * self.num_slots
+        self.versions = [None] * self.num_slots
+        # memory plan, built on the first planned run
+        self.last_use = None
+        self.owned = None
+        self.buffers_reused = 0
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def feed(self, feed_dict):
+        """
+        Values fed to the placeholders, by slot. A placeholder is shared
+        by the tapes of all roots built on it, so it is never written,
+        concurrent runs of different tapes do not see each other's feed.
+        """
+        return {self.slot_of[node]: node.fed_value(feed_dict)
+                for node in self.placeholders}
+
+    def execute(self, feed_dict):
+        """
+        Replay the whole tape, return the value of every slot.
+        """
+        slots = [None] * self.num_slots
+        for out, value in self.feed(feed_dict).items():
+            slots[out] = value
+        self.replay(slots, self.replayed)
+        return slots
+
+    def replay(self, slots, indices):
+        instructions = self.instructions
+        for index in indices:
+            opcode, out, fn, args = instructions[index]
+            if opcode == CALL2:
+                slots[out] = fn(slots[args[0]], slots[args[1]])
+            elif opcode == CALL1:
+                slots[out] = fn(slots[args[0]])
+            elif opcode == LOAD:
+                slots[out] = fn.value
+            else:
+                slots[out] = fn(*[slots[i] for i in args])
+
+    def replay_profiled(self, slots, indices, profiler):
+        """
+        Replay with every operator timed, kept apart from replay so
+        runs without a profiler pay nothing.
+        """
+        instructions = self.instructions
+        outputs = self.outputs
+        clock = time.perf_counter_ns
+        for index in indices:
+            opcode, out, fn, args = instructions[index]
+            if opcode == LOAD:
+                slots[out] = fn.value
+                continue
+            start = clock()
+            slots[out] = fn(*[slots[i] for i in args])
+            profiler.record(outputs[out], start, clock() - start, slots[out])
+
+    def replay_parallel(self, slots, indices, executor, num_workers):
+        """
+        Replay level by level, the instructions of a level are split
+        into chunks running on the executor.
+        """
+        by_level = {}
+        for index in indices:
+            by_level.setdefault(self.levels[index], []).append(index)
+
+        for level in sorted(by_level):
+            level_indices = by_level[level]
+            if len(level_indices) < 2 or num_workers < 2:
+                self.replay(slots, level_indices)
+                continue
+            chunks = [level_indices[i::num_workers]
+                      for i in range(min(num_workers, len(level_indices)))]
+            futures = [executor.submit(self.replay, slots, chunk)
+                       for chunk in chunks]
+            for future in futures:
+                future.result()
+
+    def plan(self):
+        """
+        Last use of every slot, and the slots whose buffer the tape
+        owns: written by an elementwise operator and read by
+        elementwise operators only, so no other slot aliases it.
+        """
+        last_use = list(range(self.num_slots))
+        for _, out, _, args in self.instructions:
+            for i in args:
+                last_use[i] = out
+        last_use[-1] = self.num_slots   # root is never freed
+
+        outputs = self.outputs
+        elementwise = [opcode != LOAD and outputs[out].elementwise
+                       for opcode, out, _, _ in self.instructions]
+        owned = [elementwise[out] and all(elementwise[consumer]
+                                          for consumer in self.consumers[out])
+                 for out in range(self.num_slots)]
+        owned[-1] = False
+        self.last_use = last_use
+        self.owned = owned
+
+    def execute_planned(self, feed_dict):
+        """
+        Replay the whole tape freeing values after their last use, an
+        elementwise operator writes into a dead input buffer or a
+        recycled one of the same shape and dtype when it can. Only the
+        root value is kept, other nodes are not written.
+        """
+        fed = self.feed(feed_dict)
+        if self.last_use is None:
+            self.plan()
+
+        last_use = self.last_use
+        owned = self.owned
+        outputs = self.outputs
+        slots = [None] * self.num_slots
+        free = {}     # (shape, dtype): dead owned buffers
+        reused = 0
+        for opcode, out, fn, args in self.instructions:
+            if opcode == LOAD:
+                slots[out] = fed[out] if out in fed else fn.value
+                continue
+            values = [slots[i] for i in args]
+
+            buffer = None
+            if owned[out] or out == self.num_slots - 1:
+                buffer = self._output_buffer(out, args, values, free)
+            if buffer is None:
+                slots[out] = fn(*values)
+            else:
+                slots[out] = outputs[out].forward_into(buffer, *values)
+                reused += 1
+
+            for i, value in zip(args, values):
+                if last_use[i] != out:
+                    continue
+                if owned[i] and value is not buffer and \
+                        isinstance(value, np.ndarray):
+                    buffers = free.setdefault((value.shape, value.dtype), [])
+                    if len(buffers) < MAX_FREE_BUFFERS:
+                        buffers.append(value)
+                slots[i] = None
+        self.buffers_reused = reused
+        return slots[-1]
+
+    def _output_buffer(self, out, args, values, free):
+        # a dead owned buffer of the output shape and dtype
+        if not self.outputs[out].elementwise:
+            return None
+        try:
+            shape = np.broadcast_shapes(*[np.shape(v) for v in values])
+        except ValueError:
+            return None
+        dtype = np.result_type(*values)
+        if dtype.kind not in 'fc':
+            return None
+        for i, value in zip(args, values):
+            if self.owned[i] and self.last_use[i] == out and \
+                    isinstance(value, np.ndarray) and \
+                    value.shape == shape and value.dtype == dtype:
+                return value
+        buffers = free.get((shape, dtype))
+        return buffers.pop() if buffers else None
+
+    def dirty(self, fed=()):
+        """
+        Instructions depend on leaves changed since the last run or on
+        the fed slots, in the order of the tape, fed slots excluded.
+        """
+        versions = self.versions
+        stack = [out for out, node in self.leaves
+                 if out in fed or node._version != versions[out]]
+        if len(stack) == len(self.leaves):
+            return self.replayed
+
+        marked = set(stack)
+        while stack:
+            for consumer in self.consumers[stack.pop()]:
+                if consumer not in marked:
+                    marked.add(consumer)
+                    stack.append(consumer)
+        return sorted(marked.difference(fed))
+
+    def run(self, feed_dict, executor=None, num_workers=1, profiler=None):
+        """
+        Recompute the cone of changed leaves only, reuse the values
+        of the last run everywhere else. With an executor independent
+        instructions run in parallel, with a profiler they run one by
+        one and are timed.
+        """
+        fed = self.feed(feed_dict)
+        indices = self.dirty(fed)
+        slots = self.slots
+        for out, value in fed.items():
+            slots[out] = value
+        if profiler is not None:
+            self.replay_profiled(slots, indices, profiler)
+        elif executor is None:
+            self.replay(slots, indices)
+        else:
+            self.replay_parallel(slots, indices, executor, num_workers)
+
+        outputs = self.outputs
+        instructions = self.instructions
+        for index in indices:
+            # leaves keep their values and versions, a write back would
+            # mark them changed for every other tape reading them
+            if instructions[index][0] != LOAD:
+                outputs[index].value = slots[index]
+        for out, node in self.leaves:
+            self.versions[out] = node._version
+        return self.root
+
+
+def compile_nodes(sorted_nodes):
+    slot_of = {}
+    instructions = []
+    placeholders = []
+
+    for out, node in enumerate(sorted_nodes):
+        slot_of[node] = out
+        if isinstance(node, ops.Operator):
+            args = tuple(slot_of[input_node]
+                         for input_node in node._input_nodes)
+            if len(args) == 1:
+                opcode = CALL1
+            elif len(args) == 2:
+                opcode = CALL2
+            else:
+                opcode = CALLN
+            # pre-bound forward of the operator
+            instructions.append((opcode, out, node.forward, args))
+        else:
+            if isinstance(node, ops.PlaceHolder):
+                placeholders.append(node)
+            instructions.append((LOAD, out, node, ()))
+
+    root = sorted_nodes[-1] if sorted_nodes else None
+    return Tape(instructions, placeholders, list(sorted_nodes), root)
@@ -0,0 +1,83 @@
+import numpy as np
+from . import error
+from .compiler import LOAD
+from .graph import DefaultGraphSet
+from .utils import flatten_iterable
+
+
+def jvp(root, wrt, tangents, feed_dict=None):
+    """
+    Forward mode, push tangents of wrt nodes along with the values
+    through the graph of root in one pass, no gradient node is built.
+    Return the value of root and its tangent, for a Tuple root both
+    are tuples.
+    """
+    wrt = flatten_iterable(wrt)
+    if not isinstance(tangents, (list, tuple)):
+        tangents = [tangents]
+    if len(wrt) != len(tangents):
+        raise error.GradValueError(
+            f'{len(wrt)} wrt nodes but {len(tangents)} tangents.')
+
+    tape = DefaultGraphSet().find_set_graph(root).tape
+    fed = tape.feed(feed_dict or {})
+
+    values = [None] * tape.num_slots
+    tangent_slots = [None] * tape.num_slots
+    seeds = {}
+    for node, tangent in zip(wrt, tangents):
+        if node in tape.slot_of:
+            seeds[tape.slot_of[node]] = tangent
+
+    for opcode, out, fn, args in tape.instructions:
+        if opcode == LOAD:
+            values[out] = fed[out] if out in fed else fn.value
+            tangent_slots[out] = seeds.get(out)
+            continue
+
+        input_values = [values[i] for i in args]
+        values[out] = fn(*input_values)
+        input_tangents = [tangent_slots[i] for i in args]
+        if any(tangent is not None for tangent in input_tangents):
+            node = tape.outputs[out]
+            tangent_slots[out] = node.jvp(
+                values[out], input_values, input_tangents)
+
+    value = values[-1]
+    tangent = tangent_slots[-1]
+    if tangent is None:
+        # root not depends on wrt
+        if isinstance(value, tuple):
+            tangent = tuple(np.zeros_like(v) for v in value)
+        else:
+            tangent = np.zeros_like(value)
+    return value, tangent
+
+
+class HessianVectorProduct(object):
+    def __init__(self, root, wrt=None):
+        """
+        Forward over reverse, the gradient graph of root is built once,
+        every product pushes the vectors through it with jvp, so its
+        cost is a small multiple of a gradient evaluation.
+        """
+        if wrt is None:
+            wrt = root.trainable_parameters()
+        self.wrt = flatten_iterable(wrt)
+        self.grads = root.grad(*self.wrt)
+
+    def __call__(self, vectors, feed_dict=None):
+        if not isinstance(vectors, (list, tuple)):
+            vectors = [vectors]
+        _, products = jvp(self.grads, self.wrt, vectors, feed_dict)
+        if len(self.wrt) == 1:
+            return [products]
+        return list(products)
+
+
+def hvp(root, wrt, vectors, feed_dict=None):
+    """
+    Hessian of root wrt nodes times vectors, one product per wrt node.
+    Use HessianVectorProduct to reuse the gradient graph.
+    """
+    return HessianVectorProduct(root, wrt)(vectors, feed_dict)
@@ -1,11 +1,17 @@
+import threading
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from functools import partial
 from . import error
 from .singleton import Singleton
 from .algorithms import topsort
+from .compiler import compile_nodes
 
 
 class Graph(object):
     def __init__(self):
         self._sorted_nodes = []
+        self._tape = None
         self._root = None
 
     @property
@@ -20,6 +26,8 @@ class Graph(object):
 
     def set_root(self, root):
         self._root = root
+        self._sorted_nodes = []
+        self._tape = None
 
     @property
     def sorted_nodes(self):
@@ -27,18 +35,50 @@ class Graph(object):
             self._sorted_nodes = topsort(self.root)
         return self._sorted_nodes
 
+    @property
+    def tape(self):
+        # compiled once, replayed on every run
+        if self._tape is None:
+            self._tape = compile_nodes(self.sorted_nodes)
+        return self._tape
+
+
+CacheInfo = namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'max_size', 'size'])
+
 
 class GraphSet(object):
-    def __init__(self):
-        self._graphs = {}
+    def __init__(self, max_size=1024):
+        """
+        Bounded LRU cache of graphs per root. A graph is kept on its
+        root, keyed by set, the set only holds weak references to
+        roots, so a graph is collected with its root or dropped when
+        evicted.
+        """
+        self._graphs = OrderedDict()
+        # keys of collected roots, removed under the lock
+        self._dead = deque()
         self._current_root = None
+        self._lock = threading.RLock()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            self._purge()
+            return len(self._graphs)
 
     @property
     def current(self):
         # return current graph
-        if self._current_root is None:
+        root = None
+        if self._current_root is not None:
+            root = self._current_root()
+        if root is None:
             raise error.GradValueError('Current root not set.')
-        return self._graphs[self._current_root]
+        return root._graphs.get(self)
 
     @staticmethod
     def new_graph(root):
@@ -49,12 +89,56 @@ class GraphSet(object):
     def find_set_graph(self, root):
         if root is None:
             raise error.GraphError('root is None.')
-        self._current_root = root
-        if root not in self._graphs.keys():
-            graph = self.new_graph(root)
-            self._graphs[root] = graph
-        return self.current
+
+        with self._lock:
+            self._purge()
+            if root._graphs is None:
+                root._graphs = {}
+            graph = root._graphs.get(self)
+            if graph is not None and root.id in self._graphs:
+                self.hits += 1
+                self._graphs.move_to_end(root.id)
+            else:
+                self.misses += 1
+                graph = self.new_graph(root)
+                root._graphs[self] = graph
+                self._graphs[root.id] = weakref.ref(
+                    root, partial(self._discard, root.id))
+                self.evict(self.max_size)
+            self._current_root = weakref.ref(root)
+        return graph
+
+    def _discard(self, key, ref):
+        # root collected, the callback may run in any thread and in
+        # the middle of a locked update, so only queue the key
+        self._dead.append(key)
+
+    def _purge(self):
+        while self._dead:
+            self._graphs.pop(self._dead.popleft(), None)
+
+    def evict(self, max_size):
+        with self._lock:
+            self._purge()
+            while len(self._graphs) > max_size:
+                _, ref = self._graphs.popitem(last=False)
+                root = ref()
+                if root is not None:
+                    root._graphs.pop(self, None)
+                self.evictions += 1
+
+    def clear(self):
+        self.evict(0)
+
+    def cache_info(self):
+        with self._lock:
+            self._purge()
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.max_size, len(self._graphs))
 
 
 class DefaultGraphSet(GraphSet, Singleton):
-    pass
+    def __init__(self, *args, **kwds):
+        # the singleton is initialized once
+        if not hasattr(self, '_graphs'):
+            super().__init__(*args, **kwds)
@@ -0,0 +1,266 @@
+import numpy as np
+from .ops import Operator
+from .utils import unbroadcast
+
+
+def _floating(value):
+    # float inputs keep their dtype, others are promoted
+    value = np.asarray(value)
+    if value.dtype.kind not in 'fc':
+        value = value.astype(float)
+    return value
+
+
+def _difference(first, second):
+    # first - second, None is zero
+    if second is None:
+        return first
+    if first is None:
+        return -second
+    return first - second
+
+
+class Loss(Operator):
+    __slots__ = ('reduction',)
+
+    def __init__(self, prediction, target, reduction='mean'):
+        """
+        Loss of a prediction against a target in one node, the value
+        and the gradients are computed by vectorized kernels, the
+        symbolic gradient is one LossGrad node per input. reduction
+        is 'mean' or 'sum' over examples.
+        """
+        if reduction not in ('mean', 'sum'):
+            raise ValueError(f'Unknown reduction {reduction}.')
+        super().__init__(prediction, target)
+        self.reduction = reduction
+
+    def count(self, prediction):
+        # number of examples the sum is divided by
+        if self.reduction == 'sum':
+            return 1
+        return max(np.size(prediction), 1)
+
+    def losses(self, prediction, target):
+        """
+        Loss of every element, summed by forward.
+        """
+        raise NotImplementedError
+
+    def gradient(self, index, prediction, target):
+        """
+        Gradient of the summed losses wrt prediction (index 0) or
+        target (index 1).
+        """
+        raise NotImplementedError
+
+    def hessian_vector(self, index, prediction, target, tangents):
+        """
+        Derivative of gradient(index) along the tangents of prediction
+        and target, a tangent of None is zero.
+        """
+        raise NotImplementedError
+
+    def input_grad(self, index, prediction, target):
+        prediction = _floating(prediction)
+        target = _floating(target)
+        grad = self.gradient(index, prediction, target)
+        grad = grad / self.count(prediction)
+        return unbroadcast(grad, np.shape((prediction, target)[index]))
+
+    def input_hessian_vector(self, index, prediction, target, tangents):
+        prediction = _floating(prediction)
+        target = _floating(target)
+        product = self.hessian_vector(index, prediction, target, tangents)
+        product = product / self.count(prediction)
+        return unbroadcast(product, np.shape((prediction, target)[index]))
+
+    def forward(self, prediction, target):
+        prediction = _floating(prediction)
+        target = _floating(target)
+        return np.sum(self.losses(prediction, target)) / \
+            self.count(prediction)
+
+    def jvp(self, output, values, tangents):
+        tangent = 0.0
+        for index, input_tangent in enumerate(tangents):
+            if input_tangent is not None:
+                grad = self.input_grad(index, *values)
+                tangent = tangent + np.sum(grad * input_tangent)
+        return tangent
+
+    def vjp(self, output, values, grad, needs):
+        return [grad * self.input_grad(index, *values) if need else None
+                for index, need in enumerate(needs)]
+
+    def eval_grad(self, wrt):
+        index = 0 if wrt == self._input_nodes[0] else 1
+        grad_node = LossGrad(*self._input_nodes, self, self._grad,
+                             index=index)
+        grad_node.set_grad_ref(wrt)
+        return grad_node
+
+
+class LossGrad(Operator):
+    __slots__ = ('index',)
+
+    def __init__(self, prediction, target, loss, grad, index=0):
+        """
+        Gradient of a loss node wrt its input index, the kernels and
+        settings are the ones of the loss node. Its jvp is the
+        Hessian vector kernel of the loss, for forward over reverse.
+        """
+        super().__init__(prediction, target, loss, grad)
+        self.index = index
+
+    def forward(self, prediction, target, output, grad):
+        loss = self._input_nodes[2]
+        return grad * loss.input_grad(self.index, prediction, target)
+
+    def jvp(self, output, values, tangents):
+        prediction, target, _, grad = values
+        loss = self._input_nodes[2]
+        # the value of the loss node is not used, nor its tangent
+        tangent = None
+        if tangents[3] is not None:
+            tangent = tangents[3] * loss.input_grad(
+                self.index, prediction, target)
+        if tangents[0] is not None or tangents[1] is not None:
+            term = grad * loss.input_hessian_vector(
+                self.index, prediction, target, tangents[:2])
+            tangent = term if tangent is None else tangent + term
+        return tangent
+
+
+class MeanSquaredError(Loss):
+    __slots__ = ()
+
+    def losses(self, prediction, target):
+        return (prediction - target) ** 2
+
+    def gradient(self, index, prediction, target):
+        grad = 2 * (prediction - target)
+        return grad if index == 0 else -grad
+
+    def hessian_vector(self, index, prediction, target, tangents):
+        product = 2 * _difference(*tangents)
+        return product if index == 0 else -product
+
+
+class SoftmaxCrossEntropy(Loss):
+    __slots__ = ('axis',)
+
+    def __init__(self, logits, labels, axis=-1, reduction='mean'):
+        """
+        Cross entropy of softmax(logits) against label probabilities
+        or one hot labels along axis, through log-sum-exp, so large
+        logits not overflow.
+        """
+        super().__init__(logits, labels, reduction)
+        self.axis = axis
+
+    def count(self, logits):
+        if self.reduction == 'sum' or np.ndim(logits) == 0:
+            return 1
+        return max(np.size(logits) // np.shape(logits)[self.axis], 1)
+
+    def log_sum_exp(self, logits):
+        top = np.max(logits, axis=self.axis, keepdims=True)
+        return top + np.log(np.sum(np.exp(logits - top), axis=self.axis,
+                                   keepdims=True))
+
+    def losses(self, logits, labels):
+        return labels * (self.log_sum_exp(logits) - logits)
+
+    def gradient(self, index, logits, labels):
+        log_probs = logits - self.log_sum_exp(logits)
+        if index == 1:
+            return -log_probs
+        total = np.sum(labels, axis=self.axis, keepdims=True)
+        return np.exp(log_probs) * total - labels
+
+    def hessian_vector(self, index, logits, labels, tangents):
+        logits_tangent, labels_tangent = tangents
+        probs = np.exp(logits - self.log_sum_exp(logits))
+        # tangent of log softmax
+        log_probs_tangent = 0.0
+        if logits_tangent is not None:
+            log_probs_tangent = logits_tangent - np.sum(
+                probs * logits_tangent, axis=self.axis, keepdims=True)
+        if index == 1:
+            return -log_probs_tangent
+
+        total = np.sum(labels, axis=self.axis, keepdims=True)
+        product = probs * log_probs_tangent * total
+        if labels_tangent is not None:
+            product = product + probs * np.sum(
+                labels_tangent, axis=self.axis, keepdims=True) - \
+                labels_tangent
+        return product
+
+
+class LogisticLoss(Loss):
+    __slots__ = ()
+
+    def losses(self, logits, labels):
+        # log(1 + exp(x)) - y * x without overflow
+        return np.maximum(logits, 0) - logits * labels + \
+            np.log1p(np.exp(-np.abs(logits)))
+
+    def gradient(self, index, logits, labels):
+        if index == 1:
+            return -logits
+        return 0.5 * (1 + np.tanh(0.5 * logits)) - labels
+
+    def hessian_vector(self, index, logits, labels, tangents):
+        logits_tangent, labels_tangent = tangents
+        if index == 1:
+            return 0.0 if logits_tangent is None else -logits_tangent
+        product = 0.0
+        if logits_tangent is not None:
+            sigmoid = 0.5 * (1 + np.tanh(0.5 * logits))
+            product = sigmoid * (1 - sigmoid) * logits_tangent
+        if labels_tangent is not None:
+            product = product - labels_tangent
+        return product
+
+
+class HuberLoss(Loss):
+    __slots__ = ('delta',)
+
+    def __init__(self, prediction, target, delta=1.0, reduction='mean'):
+        """
+        Squared error for residuals up to delta, linear beyond.
+        """
+        super().__init__(prediction, target, reduction)
+        self.delta = delta
+
+    def losses(self, prediction, target):
+        residual = np.abs(prediction - target)
+        return np.where(residual <= self.delta, 0.5 * residual ** 2,
+                        self.delta * (residual - 0.5 * self.delta))
+
+    def gradient(self, index, prediction, target):
+        grad = np.clip(prediction - target, -self.delta, self.delta)
+        return grad if index == 0 else -grad
+
+    def hessian_vector(self, index, prediction, target, tangents):
+        inside = np.abs(prediction - target) <= self.delta
+        product = np.where(inside, _difference(*tangents), 0.)
+        return product if index == 0 else -product
+
+
+def mse(prediction, target, reduction='mean'):
+    return MeanSquaredError(prediction, target, reduction)
+
+
+def softmax_cross_entropy(logits, labels, axis=-1, reduction='mean'):
+    return SoftmaxCrossEntropy(logits, labels, axis, reduction)
+
+
+def logistic(logits, labels, reduction='mean'):
+    return LogisticLoss(logits, labels, reduction)
+
+
+def huber(prediction, target, delta=1.0, reduction='mean'):
+    return HuberLoss(prediction, target, delta, reduction)
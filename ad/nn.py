@@ -0,0 +1,137 @@
+import numpy as np
+from .ops import Node
+from .utils import flatten_iterable
+
+
+class Optimizer(object):
+    def __init__(self, parameters, lr):
+        """
+        parameters are Variables or a root whose trainable parameters
+        are optimized. Their values are moved into one contiguous
+        buffer, the value of each Variable is a view of it, so a step
+        updates all parameters with a few vectorized numpy calls.
+        """
+        if isinstance(parameters, Node):
+            parameters = parameters.trainable_parameters()
+        self.parameters = flatten_iterable(parameters)
+        self.lr = lr
+        self.steps = 0
+
+        values = [np.asarray(node.value) for node in self.parameters]
+        # keep float32 parameters float32, integers train as float
+        dtype = np.result_type(*values) if values else np.dtype(float)
+        if dtype.kind not in 'fc':
+            dtype = np.result_type(float, dtype)
+        self.flat = np.empty(sum(value.size for value in values), dtype)
+        self.grad = np.empty_like(self.flat)
+        self.buffer = np.empty_like(self.flat)
+        self.views = []
+        self.grad_views = []
+        offset = 0
+        for node, value in zip(self.parameters, values):
+            view = self.flat[offset:offset + value.size].reshape(value.shape)
+            view[...] = value
+            node.value = view
+            self.views.append(view)
+            self.grad_views.append(
+                self.grad[offset:offset + value.size].reshape(value.shape))
+            offset += value.size
+
+    def zeros(self):
+        # a state buffer shaped like the flat parameters
+        return np.zeros_like(self.flat)
+
+    def gather(self, grads, scale=1):
+        """
+        Copy gradients, arrays or evaluated nodes, times scale into the
+        flat gradient buffer, and values assigned since the last step
+        into the flat parameters.
+        """
+        if isinstance(grads, Node):
+            grads = flatten_iterable(grads)
+        if len(grads) != len(self.parameters):
+            raise ValueError(f'{len(self.parameters)} parameters but '
+                             f'{len(grads)} gradients.')
+        for node, view, grad_view, grad in zip(
+                self.parameters, self.views, self.grad_views, grads):
+            if node.value is not view:
+                view[...] = node.value
+            if isinstance(grad, Node):
+                grad = grad.value
+            if scale == 1:
+                grad_view[...] = grad
+            else:
+                np.multiply(grad, scale, out=grad_view)
+
+    def step(self, grads):
+        """
+        Update all parameters in place from their gradients, in the
+        order of parameters.
+        """
+        self.gather(grads, self.grad_scale())
+        self.steps += 1
+        self.update(self.grad)
+        # assign the views again, so the new values get new versions
+        for node, view in zip(self.parameters, self.views):
+            node.value = view
+
+    def grad_scale(self):
+        # factor applied while gathering, saves a pass over the buffer
+        return 1
+
+    def update(self, grad):
+        raise NotImplementedError
+
+
+class SGD(Optimizer):
+    def grad_scale(self):
+        return self.lr
+
+    def update(self, grad):
+        # grad is scaled by lr already
+        np.subtract(self.flat, grad, out=self.flat)
+
+
+class Momentum(Optimizer):
+    def __init__(self, parameters, lr, momentum=0.9):
+        super().__init__(parameters, lr)
+        self.momentum = momentum
+        self.velocity = self.zeros()
+
+    def update(self, grad):
+        # v = momentum * v + grad, p -= lr * v
+        np.multiply(self.velocity, self.momentum, out=self.velocity)
+        np.add(self.velocity, grad, out=self.velocity)
+        np.multiply(self.velocity, self.lr, out=self.buffer)
+        np.subtract(self.flat, self.buffer, out=self.flat)
+
+
+class Adam(Optimizer):
+    def __init__(self, parameters, lr=1e-3, beta1=0.9, beta2=0.999,
+                 eps=1e-8):
+        super().__init__(parameters, lr)
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.m = self.zeros()
+        self.v = self.zeros()
+
+    def update(self, grad):
+        buffer = self.buffer
+        np.multiply(self.m, self.beta1, out=self.m)
+        np.multiply(grad, 1 - self.beta1, out=buffer)
+        np.add(self.m, buffer, out=self.m)
+
+        np.multiply(grad, grad, out=buffer)
+        np.multiply(buffer, 1 - self.beta2, out=buffer)
+        np.multiply(self.v, self.beta2, out=self.v)
+        np.add(self.v, buffer, out=self.v)
+
+        # bias corrections folded into the step size
+        lr = self.lr * np.sqrt(1 - self.beta2 ** self.steps) / \
+            (1 - self.beta1 ** self.steps)
+        np.sqrt(self.v, out=buffer)
+        np.add(buffer, self.eps, out=buffer)
+        np.divide(self.m, buffer, out=buffer)
+        np.multiply(buffer, lr, out=buffer)
+        np.subtract(self.flat, buffer, out=self.flat)
@@ -1,69 +1,152 @@
-import math
-import time
-from collections.abc import Iterable
+import itertools
+import weakref
+import numpy as np
 from . import algorithms
 from . import error
-from .utils import flatten_iterable, find_node
+from .graph import DefaultGraphSet
+from .utils import broadcast_like, flatten_iterable, unbroadcast
 
 
-__all__ = ['Constant', 'Variable', 'Node', 'Add', 'Minus',
+__all__ = ['Constant', 'Variable', 'PlaceHolder', 'Node', 'Add', 'Minus',
            'Mul', 'Neg', 'Div', 'Pow', 'Log', 'Reciprocal',
-           'Ones', 'Zeros']
+           'Ones', 'Zeros', 'Unbroadcast', 'Broadcast', 'OnesLike',
+           'ZerosLike']
+
+
+# names of shared subgraphs grow exponentially, truncate them
+MAX_NAME_LENGTH = 64
+# versions of leaf values, unique over all leaves
+_versions = itertools.count()
+_node_ids = itertools.count()
+
+
+# Nodes own their inputs, back references to outputs and grad refs are
+# weak, so an expression is collected once its root is unreachable.
+def _add_ref(refs, node):
+    # refs is None, a weak reference, or a WeakSet with more nodes
+    if refs is None or (type(refs) is weakref.ref and refs() is None):
+        return weakref.ref(node)
+    if type(refs) is weakref.WeakSet:
+        refs.add(node)
+        return refs
+    return weakref.WeakSet((refs(), node))
+
+
+def _has_ref(refs, node):
+    if refs is None:
+        return False
+    if type(refs) is weakref.WeakSet:
+        return node in refs
+    return refs() is node
+
+
+def _ref_nodes(refs):
+    if refs is None:
+        return ()
+    if type(refs) is weakref.WeakSet:
+        return refs
+    node = refs()
+    return () if node is None else (node,)
 
 
 class Node(object):
+    __slots__ = ('id', '_version', 'value', '_name', '_grad', '_graphs',
+                 '_input_nodes', '_outputs', '_grad_refs', '__weakref__')
+
     def __init__(self, name):
         """
         Bidirectional Graph
         """
-        if not isinstance(name, str):
+        if name is not None and not isinstance(name, str):
             name = str(name)
 
+        self.id = next(_node_ids)
+        self._version = None
         self.value = None
-        self.name = name
+        self._name = name
         self._grad = None
-        self._hash = None
-        self._input_nodes = []
-        self._output_nodes = []
-        self._grad_ref_nodes = []
+        # cached graph when used as root, see GraphSet
+        # graph per GraphSet when the node is a root
+        self._graphs = None
+        # inputs keep the order of operands, most nodes have a single
+        # output, so outputs and grad refs only become sets when needed
+        self._input_nodes = ()
+        self._outputs = None
+        self._grad_refs = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._name = name
+
+    def render_name(self, budget):
+        return str(self.name)
+
+    def attributes(self):
+        """
+        Settings of the node besides its inputs and value, the slots
+        declared by subclasses of Leaf and Operator.
+        """
+        attributes = []
+        for cls in type(self).__mro__:
+            if cls in (Leaf, Operator, Node):
+                break
+            for slot in cls.__dict__.get('__slots__', ()):
+                attributes.append((slot, getattr(self, slot)))
+        return tuple(attributes)
+
+    @property
+    def _output_nodes(self):
+        return _ref_nodes(self._outputs)
+
+    @property
+    def _grad_ref_nodes(self):
+        return _ref_nodes(self._grad_refs)
 
     def eval(self, *args, **kwds):
         raise NotImplementedError
 
-    def __call__(self):
-        return self.eval()
+    def __call__(self, feed_dict=None):
+        # evaluate the graph of current node, every node once
+        tape = DefaultGraphSet().find_set_graph(self).tape
+        with tape.lock:
+            return tape.run(feed_dict or {})
 
     def __eq__(self, node):
-        return self.__hash__ == node.__hash__
+        return self is node
 
     def __hash__(self):
-        if self._hash is None:
-            self._hash = hash(self.name + str(time.time()))
-        return self._hash
+        return self.id
 
     def set_inputs(self, *nodes):
+        input_nodes = []
         for node in nodes:
-            self.set_input(node)
+            if not isinstance(node, Node):
+                raise ValueError('A Node is required.')
+
+            if not self.has_input(node):
+                input_nodes.append(node)
+                node._outputs = _add_ref(node._outputs, self)
+        self._input_nodes += tuple(input_nodes)
 
     def set_outputs(self, *nodes):
         for node in nodes:
             self.set_output(node)
 
-    def set_input(self, node):
-        if not isinstance(node, Node):
-            raise ValueError('A Node is required.')
+    def has_input(self, node):
+        # edges are bidirectional, O(1) lookup in outputs of the input
+        return _has_ref(node._outputs, self)
 
-        if node not in self._input_nodes:
-            self._input_nodes.append(node)
-            node.set_output(self)
+    def set_input(self, node):
+        self.set_inputs(node)
 
     def set_output(self, node):
         if not isinstance(node, Node):
             raise ValueError('A Node is required.')
-
-        if node not in self._output_nodes:
-            self._output_nodes.append(node)
-            node.set_input(self)
+        node.set_inputs(self)
 
     def set_grad_refs(self, *nodes):
         for node in nodes:
@@ -74,58 +157,66 @@ class Node(object):
         if not isinstance(node, Node):
             raise ValueError('A Node is required.')
 
-        if node not in self._grad_ref_nodes:
-            self._grad_ref_nodes.append(node)
-            node.set_grad_ref(self)
+        if not _has_ref(self._grad_refs, node):
+            self._grad_refs = _add_ref(self._grad_refs, node)
+            node._grad_refs = _add_ref(node._grad_refs, self)
 
     def set_root_grad(self):
-        self._grad = Ones(f'Grad({self.name})')
+        # ones in the shape and dtype of root
+        self._grad = OnesLike(self)
 
     def grad_wrt_check(self, node):
-        if node not in self._input_nodes:
-            error.GradValueError(
+        if not self.has_input(node):
+            raise error.GradValueError(
                 f'Node({node.name}) is not a input of operation {self.name}')
 
-    def self_grad(self):
-        if self._grad is None:
-            if self._output_nodes:
-                for node in self._output_nodes:
-                    # Fix me
-                    if self._grad is None:
-                        self._grad = node
-                    else:
-                        self._grad = Add(self._grad, node)
-            else:
-                self.set_root_grad()
-
     def eval_grad(self, wrt):
         raise NotImplementedError
 
-    def _node_grad(self, wrt):
-        self.self_grad()
-
-        # dfs search wrt node
-        if find_node(wrt, self._input_nodes):
-            # Fix me
-            grad_node = self.eval_grad(wrt)
-            return grad_node
-        else:
-            if self._input_nodes:
-                for input_node in self._input_nodes:
-                    grad_node = input_node._node_grad(wrt)
-                    if grad_node is not None:
-                        return grad_node
-            else:
-                return None
+    def backward(self):
+        """
+        Reverse mode sweep over the sorted nodes of the current node,
+        return the adjoint node of every node depends on it.
+        """
+        sorted_nodes = DefaultGraphSet().find_set_graph(self).sorted_nodes
+        contributions = {}
+        adjoints = {}
+        self.set_root_grad()
+
+        for node in reversed(sorted_nodes):
+            if node is not self:
+                grads = contributions.pop(node, None)
+                if grads is None:
+                    # root not depends on it
+                    node._grad = None
+                    continue
+                node._grad = grads[0] if len(grads) == 1 else Add(*grads)
+            adjoints[node] = node._grad
+
+            if not isinstance(node, Operator):
+                continue
+            for input_node in node._input_nodes:
+                grad_node = node.eval_grad(input_node)
+                contributions.setdefault(input_node, []).append(grad_node)
+
+        # adjoints are only needed during the sweep
+        for node in sorted_nodes:
+            node._grad = None
+        return adjoints
 
     def grad(self, *wrt):
         wrt = flatten_iterable(wrt)
+        if not wrt:
+            wrt = self.trainable_parameters()
+        adjoints = self.backward()
         output = []
 
         for node in wrt:
-            grad_node = self._node_grad(node)
-            if grad_node is not None:
-                output.append(grad_node)
+            grad_node = adjoints.get(node)
+            if grad_node is None:
+                # root not depends on node
+                grad_node = ZerosLike(node)
+            output.append(grad_node)
 
         if len(output) == 1:
             return output[0]
@@ -134,9 +225,8 @@ class Node(object):
 
     def trainable_parameters(self):
         # current node as root
-        all_node = []
+        all_node = algorithms.topsort(self)
         all_trainable_node = []
-        algorithms.dfs(self, all_node)
 
         for node in all_node:
             if isinstance(node, Variable):
@@ -149,48 +239,76 @@ class Node(object):
     __repr__ = __str__
 
     def clean(self):
-        del self._input_nodes
-        del self._output_nodes
-        self._input_nodes = []
-        self._output_nodes = []
+        self._input_nodes = ()
+        self._outputs = None
+
 
+class Leaf(Node):
+    """
+    Node without inputs, every assignment of value gets a new version,
+    so compiled tapes only recompute what depends on changed leaves.
+    Assign the value again after modifying it in place.
+    """
+    __slots__ = ('_value',)
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self._version = next(_versions)
+
+    def eval(self):
+        return self
+
+
+class Variable(Leaf):
+    __slots__ = ()
 
-class Variable(Node):
     def __init__(self, value, name):
         if name is None:
             name = str(value)
         super().__init__(name)
         self.value = value
 
-    def eval(self):
-        return self
 
+class Constant(Leaf):
+    __slots__ = ()
 
-class Constant(Node):
     def __init__(self, value, name):
         if name is None:
             name = str(value)
         super().__init__(name)
         self.value = value
 
-    def eval(self):
-        return self
-
 
 class Ones(Constant):
+    __slots__ = ()
+
     def __init__(self, name=None):
         super().__init__(value=1, name=name)
 
 
 class Zeros(Constant):
+    __slots__ = ()
+
     def __init__(self, name=None):
         super().__init__(value=0, name=name)
 
 
-class PlaceHolder(Node):
-    def __init__(self, name):
+class PlaceHolder(Leaf):
+    __slots__ = ('shape',)
+
+    def __init__(self, name, shape=None):
+        """
+        shape is the shape of one example, a fed value may carry
+        an extra leading batch axis.
+        """
         self.value = None
         super().__init__(name)
+        self.shape = None if shape is None else tuple(shape)
 
     def eval(self):
         if self.value is None:
@@ -198,248 +316,640 @@ class PlaceHolder(Node):
                 f'{self.name}\'s value not set.')
         return self
 
+    def fed_value(self, feed_dict):
+        """
+        The value fed by node or name, the placeholder is not written,
+        it is shared by the graphs of all roots built on it.
+        """
+        if self in feed_dict:
+            value = feed_dict[self]
+        else:
+            try:
+                value = feed_dict[self.name]
+            except KeyError:
+                raise error.PlaceholderValueError(
+                    f'Key {self.name} not found in feed_dict.')
+
+        if isinstance(value, (list, tuple)):
+            value = np.asarray(value)
+        self.check_shape(value)
+        return value
+
     def feed_value(self, feed_dict):
-        try:
-            self.value = feed_dict[self.name]
-        except KeyError:
+        self.value = self.fed_value(feed_dict)
+
+    def check_shape(self, value):
+        if self.shape is None:
+            return
+        shape = np.shape(value)
+        if shape != self.shape and shape[1:] != self.shape:
             raise error.PlaceholderValueError(
-                f'Key {self.name} not found in feed_dict.')
+                f'{self.name} expect shape {self.shape} or '
+                f'(batch, *{self.shape}), got {shape}.')
 
     def grad(self):
         raise NotImplementedError
 
 
 class Operator(Node):
+    __slots__ = ()
+    # output of forward_into is computed elementwise from the inputs
+    elementwise = False
+
     def __init__(self, *input_nodes):
-        name = self.generate_name(*input_nodes)
-        super().__init__(name)
+        # name is rendered from the inputs on demand
+        super().__init__(None)
         self.set_inputs(*input_nodes)
 
-    @classmethod
-    def generate_name(cls, *input_nodes):
-        name = f'{cls.__name__.lower()}('
-        if isinstance(input_nodes, Iterable):
-            for node in input_nodes:
-                if node is not None:
-                    name += node.name + ','
-            name = name[:-1]    # drop ','
-        else:
-            name += input_nodes.name
-        name += ')'
+    @property
+    def name(self):
+        if self._name is None:
+            return self.render_name(MAX_NAME_LENGTH)
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._name = name
+
+    def render_name(self, budget):
+        """
+        Render name from the names of input nodes, stop as soon as
+        budget characters are used, so the cost is bounded.
+        """
+        if self._name is not None:
+            return self._name
+
+        name = f'{type(self).__name__.lower()}('
+        names = []
+        length = len(name)
+        for node in self._input_nodes:
+            if length > budget:
+                break
+            input_name = node.render_name(budget - length)
+            names.append(input_name)
+            length += len(input_name) + 1
+        name += ','.join(names) + ')'
+
+        if len(name) > budget:
+            name = name[:max(budget - 4, 0)] + '...)'
         return name
 
-    def eval(self, *args, **kwds):
+    def rebuild(self, *input_nodes):
+        # same operator and settings on other inputs
+        node = type(self).__new__(type(self))
+        Operator.__init__(node, *input_nodes)
+        for slot, value in self.attributes():
+            setattr(node, slot, value)
+        return node
+
+    def eval(self):
+        values = [node.value for node in self._input_nodes]
+        self.value = self.forward(*values)
+        return self
+
+    def forward(self, *values):
+        """
+        Compute the output value from the values of input nodes,
+        without touching the graph.
+        """
+        raise NotImplementedError
+
+    def forward_into(self, out, *values):
+        """
+        forward writing into out, an ndarray of the output shape and
+        dtype, out may be one of values.
+        """
+        raise NotImplementedError
+
+    def jvp(self, output, values, tangents):
+        """
+        Tangent of the output from the values and tangents of input
+        nodes, a tangent of None is zero.
+        """
         raise NotImplementedError
 
-    def __call__(self, *args, **kwds):
-        return self.eval()
+    def vjp(self, output, values, grad, needs):
+        """
+        Numeric gradients of the input nodes from the output value,
+        input values and the gradient of the output, shaped like the
+        inputs. needs tells which inputs need one, None for others.
+        """
+        raise NotImplementedError
 
 
 class List(Operator):
+    __slots__ = ()
+
     def __init__(self, *input_nodes):
         super().__init__(*input_nodes)
 
-    def eval(self):
+    def forward(self, *values):
+        return list(values)
+
+    def jvp(self, output, values, tangents):
         output = []
-        for node in self._input_nodes:
-            output.append(node.eval())
-        return iter(output)
+        for value, tangent in zip(values, tangents):
+            if tangent is None:
+                tangent = np.zeros_like(value)
+            output.append(tangent)
+        return list(output)
+
+    def vjp(self, output, values, grad, needs):
+        return list(grad)
 
     def __len__(self):
         return len(self._input_nodes)
 
     def __iter__(self):
-        return self.eval()
+        # values are set by the last run
+        return iter(self._input_nodes)
 
 
 class Tuple(Operator):
+    __slots__ = ()
+
     def __init__(self, *input_nodes):
         super().__init__(*input_nodes)
 
-    def eval(self):
+    def forward(self, *values):
+        return tuple(values)
+
+    def jvp(self, output, values, tangents):
         output = []
-        for node in self._input_nodes:
-            output.append(node.eval())
-        return iter(output)
+        for value, tangent in zip(values, tangents):
+            if tangent is None:
+                tangent = np.zeros_like(value)
+            output.append(tangent)
+        return tuple(output)
+
+    def vjp(self, output, values, grad, needs):
+        return list(grad)
 
     def __len__(self):
         return len(self._input_nodes)
 
     def __iter__(self):
-        return self.eval()
+        # values are set by the last run
+        return iter(self._input_nodes)
 
 
 class Add(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, *input_nodes):
         super().__init__(*input_nodes)
 
-    def eval(self):
-        self.value = 0.0
-        for node in self._input_nodes:
-            if node is not None:
-                self.value += node.eval().value
-        return self
+    def forward(self, *values):
+        output = 0.0
+        for value in values:
+            output = output + value
+        return output
+
+    def forward_into(self, out, *values):
+        # out first, so it is read before written
+        values = sorted(values, key=lambda value: value is not out)
+        if len(values) == 1:
+            out[...] = values[0]
+        else:
+            np.add(values[0], values[1], out=out)
+        for value in values[2:]:
+            np.add(out, value, out=out)
+        return out
+
+    def jvp(self, output, values, tangents):
+        tangent = None
+        for input_tangent in tangents:
+            if input_tangent is not None:
+                tangent = input_tangent if tangent is None \
+                    else tangent + input_tangent
+        return broadcast_like(tangent, output)
+
+    def vjp(self, output, values, grad, needs):
+        return [unbroadcast(grad, np.shape(value)) if need else None
+                for value, need in zip(values, needs)]
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
-        grad_node = Mul(Ones(grad_name), self._grad)
+        grad_node = Unbroadcast(self._grad, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Neg(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, input_node):
         super().__init__(input_node)
 
-    def eval(self):
-        self.value = -1 * self._input_nodes[0].value
-        return self
+    def forward(self, value):
+        return -1 * value
+
+    def forward_into(self, out, value):
+        return np.negative(value, out=out)
+
+    def jvp(self, output, values, tangents):
+        return -tangents[0]
+
+    def vjp(self, output, values, grad, needs):
+        return [-grad]
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
-        neg_sign = Constant(-1, 'Neg_sgn')
-        grad_node = Mul(Ones(grad_name), self._grad, neg_sign)
+        grad_node = simplify_neg(self._grad)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Minus(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, *input_nodes):
         if len(input_nodes) != 2:
             raise ValueError('Minus accept 2 arguments.')
         super().__init__(*input_nodes)
 
-    def eval(self):
-        first_node = self._input_nodes[0]
-        second_node = self._input_nodes[1]
-        self.value = first_node.value - second_node.value
-        return self
+    def forward(self, first, second):
+        return first - second
+
+    def forward_into(self, out, first, second):
+        return np.subtract(first, second, out=out)
+
+    def vjp(self, output, values, grad, needs):
+        first, second = values
+        return [unbroadcast(grad, np.shape(first)) if needs[0] else None,
+                unbroadcast(-grad, np.shape(second)) if needs[1] else None]
+
+    def jvp(self, output, values, tangents):
+        first, second = tangents
+        if second is None:
+            tangent = first
+        elif first is None:
+            tangent = -second
+        else:
+            tangent = first - second
+        return broadcast_like(tangent, output)
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
         if wrt == self._input_nodes[0]:
-            sign = Constant(1, 'sign')
+            grad_node = self._grad
         else:
-            sign = Constant(-1, 'sign')
-        grad_node = Mul(Ones(grad_name), self._grad, sign)
+            grad_node = simplify_neg(self._grad)
+        grad_node = Unbroadcast(grad_node, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Mul(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, *input_nodes):
         super().__init__(*input_nodes)
 
-    def eval(self):
-        self.value = 1.0
-        for node in self._input_nodes:
-            self.value *= node.eval().value
-        return self
+    def forward(self, *values):
+        output = 1.0
+        for value in values:
+            output = output * value
+        return output
+
+    def forward_into(self, out, *values):
+        # out first, so it is read before written
+        values = sorted(values, key=lambda value: value is not out)
+        if len(values) == 1:
+            out[...] = values[0]
+        else:
+            np.multiply(values[0], values[1], out=out)
+        for value in values[2:]:
+            np.multiply(out, value, out=out)
+        return out
+
+    def jvp(self, output, values, tangents):
+        tangent = None
+        for i, input_tangent in enumerate(tangents):
+            if input_tangent is None:
+                continue
+            term = input_tangent
+            for j, value in enumerate(values):
+                if i != j:
+                    term = term * value
+            tangent = term if tangent is None else tangent + term
+        return tangent
+
+    def vjp(self, output, values, grad, needs):
+        grads = []
+        for i, need in enumerate(needs):
+            if not need:
+                grads.append(None)
+                continue
+            term = grad
+            for j, value in enumerate(values):
+                if i != j:
+                    term = term * value
+            grads.append(unbroadcast(term, np.shape(values[i])))
+        return grads
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
-        grad_node = Ones(grad_name)
-        for node in self._input_nodes:
-            if node != wrt:
-                grad_node = Mul(grad_node, node)
-
-        grad_node = Mul(grad_node, self._grad)
+        factors = [node for node in self._input_nodes if node != wrt]
+        grad_node = simplify_mul(*factors, self._grad)
+        grad_node = Unbroadcast(grad_node, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Div(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, *input_nodes):
         if len(input_nodes) != 2:
             raise ValueError('Div accept 2 arguments.')
         super().__init__(*input_nodes)
 
-    def eval(self):
-        numerator_node = self._input_nodes[0]
-        denominator_node = self._input_nodes[1]
-
-        if denominator_node.value == 0:
+    def forward(self, numerator, denominator):
+        if np.any(np.equal(denominator, 0)):
             raise ValueError('Denominator is 0')
+        return numerator / denominator
 
-        self.value = numerator_node.value / denominator_node.value
-        return self
+    def forward_into(self, out, numerator, denominator):
+        if np.any(np.equal(denominator, 0)):
+            raise ValueError('Denominator is 0')
+        return np.divide(numerator, denominator, out=out)
+
+    def jvp(self, output, values, tangents):
+        denominator = values[1]
+        numerator_tangent, denominator_tangent = tangents
+        tangent = 0.0 if numerator_tangent is None else numerator_tangent
+        if denominator_tangent is not None:
+            tangent = tangent - output * denominator_tangent
+        return tangent / denominator
+
+    def vjp(self, output, values, grad, needs):
+        numerator, denominator = values
+        grad = grad / denominator
+        return [unbroadcast(grad, np.shape(numerator)) if needs[0] else None,
+                unbroadcast(-grad * output, np.shape(denominator))
+                if needs[1] else None]
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
-
         numerator_node = self._input_nodes[0]
         denominator_node = self._input_nodes[1]
 
         if wrt == numerator_node:
-            # Fix me
-            grad_node = Constant(1 / denominator_node.value, grad_name)
+            grad_node = Div(self._grad, denominator_node)
         elif wrt == denominator_node:
-            grad_node = Constant(numerator_node.value, grad_name)
-            grad_node = Mul(grad_node, Constant(-1, 'sign'))
-            grad_node = Div(
-                grad_node, Pow(denominator_node, Constant(2, 'pow')))
+            # -grad * num / den ** 2, reuse the output num / den
+            grad_node = simplify_mul(self._grad, self)
+            grad_node = simplify_neg(Div(grad_node, denominator_node))
         else:
             raise error.GradValueError(
                 f'{wrt.name} is neither numerator nor denominator')
 
-        grad_node = Mul(grad_node, self._grad)
+        grad_node = Unbroadcast(grad_node, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Pow(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, *input_nodes):
         if len(input_nodes) != 2:
             raise ValueError('Power accept 2 arguments.')
         super().__init__(*input_nodes)
 
-    def eval(self):
-        first_node = self._input_nodes[0]
-        second_node = self._input_nodes[1]
-
-        self.value = first_node.value ** second_node.value
-        return self
+    def forward(self, base, power):
+        return base ** power
+
+    def forward_into(self, out, base, power):
+        return np.power(base, power, out=out)
+
+    def jvp(self, output, values, tangents):
+        base, power = values
+        base_tangent, power_tangent = tangents
+        tangent = 0.0
+        if base_tangent is not None:
+            tangent = tangent + base_tangent * power * base ** (power - 1)
+        if power_tangent is not None:
+            tangent = tangent + power_tangent * output * np.log(base)
+        return tangent
+
+    def vjp(self, output, values, grad, needs):
+        base, power = values
+        grads = [None, None]
+        if needs[0]:
+            grads[0] = unbroadcast(grad * power * base ** (power - 1),
+                                   np.shape(base))
+        if needs[1]:
+            grads[1] = unbroadcast(grad * output * np.log(base),
+                                   np.shape(power))
+        return grads
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
         base_node = self._input_nodes[0]
         power_node = self._input_nodes[1]
 
         if wrt == base_node:
-            grad_node = Mul(
-                power_node, Pow(base_node, Minus(power_node, Ones())))
+            grad_node = simplify_mul(
+                power_node, simplify_pow_minus_one(base_node, power_node),
+                self._grad)
         elif wrt == power_node:
-            grad_node = self
-            grad_node.name = grad_name
-            grad_node = Mul(grad_node, Log(base_node))
+            # reuse the output base ** power
+            grad_node = simplify_mul(self, Log(base_node), self._grad)
         else:
             raise error.GradValueError(
                 f'{wrt.name} is neither base nor power')
 
-        grad_node = Mul(grad_node, self._grad)
+        grad_node = Unbroadcast(grad_node, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Log(Operator):
+    __slots__ = ()
+    elementwise = True
+
     def __init__(self, input_node):
         super().__init__(input_node)
 
-    def eval(self):
-        node = self._input_nodes[0]
-        if node.value <= 0:
+    def forward(self, value):
+        if np.any(np.less_equal(value, 0)):
             raise ValueError('Negtive value for log.')
-        self.value = math.log(node.value)
-        return self
+        return np.log(value)
+
+    def forward_into(self, out, value):
+        if np.any(np.less_equal(value, 0)):
+            raise ValueError('Negtive value for log.')
+        return np.log(value, out=out)
+
+    def jvp(self, output, values, tangents):
+        return tangents[0] / values[0]
+
+    def vjp(self, output, values, grad, needs):
+        return [grad / values[0]]
 
     def eval_grad(self, wrt):
-        grad_name = f'Grad({wrt.name})'
-        grad_node = Constant(1 / wrt.value, grad_name)
+        grad_node = Div(self._grad, wrt)
         grad_node.set_grad_ref(wrt)
         return grad_node
 
 
 class Reciprocal(Div):
+    __slots__ = ()
+
     def __init__(self, input_node):
         one = Ones('numerator')
         super().__init__(one, input_node)
+
+
+class Unbroadcast(Operator):
+    __slots__ = ()
+
+    def __init__(self, input_node, like_node):
+        super().__init__(input_node, like_node)
+
+    def forward(self, value, like):
+        return unbroadcast(value, np.shape(like))
+
+    def jvp(self, output, values, tangents):
+        if tangents[0] is None:
+            return None
+        return unbroadcast(tangents[0], np.shape(output))
+
+    def vjp(self, output, values, grad, needs):
+        # the like node only gives a shape
+        return [np.broadcast_to(grad, np.shape(values[0])), None]
+
+    def eval_grad(self, wrt):
+        grad_name = f'Grad({wrt.name})'
+        if wrt == self._input_nodes[0]:
+            grad_node = Broadcast(self._grad, wrt)
+        else:
+            # only the shape of like node is used
+            grad_node = Zeros(grad_name)
+        grad_node.set_grad_ref(wrt)
+        return grad_node
+
+
+class Broadcast(Operator):
+    __slots__ = ()
+
+    def __init__(self, input_node, like_node):
+        super().__init__(input_node, like_node)
+
+    def forward(self, value, like):
+        shape = np.broadcast_shapes(np.shape(value), np.shape(like))
+        return np.broadcast_to(value, shape)
+
+    def jvp(self, output, values, tangents):
+        if tangents[0] is None:
+            return None
+        return np.broadcast_to(tangents[0], np.shape(output))
+
+    def vjp(self, output, values, grad, needs):
+        return [unbroadcast(grad, np.shape(values[0])), None]
+
+    def eval_grad(self, wrt):
+        grad_name = f'Grad({wrt.name})'
+        if wrt == self._input_nodes[0]:
+            grad_node = Unbroadcast(self._grad, wrt)
+        else:
+            grad_node = Zeros(grad_name)
+        grad_node.set_grad_ref(wrt)
+        return grad_node
+
+
+class FilledLike(Operator):
+    __slots__ = ()
+    elementwise = True
+    fill = None
+
+    def __init__(self, like_node):
+        """
+        fill in the shape of like node, in its dtype when floating,
+        so the gradients keep the dtype of the parameters.
+        """
+        super().__init__(like_node)
+
+    def forward(self, like):
+        return np.full(np.shape(like), self.fill, np.result_type(like, 1.))
+
+    def forward_into(self, out, like):
+        out.fill(self.fill)
+        return out
+
+    def jvp(self, output, values, tangents):
+        return None
+
+    def vjp(self, output, values, grad, needs):
+        # the like node only gives a shape
+        return [None]
+
+    def eval_grad(self, wrt):
+        grad_node = Zeros(f'Grad({wrt.name})')
+        grad_node.set_grad_ref(wrt)
+        return grad_node
+
+
+class OnesLike(FilledLike):
+    __slots__ = ()
+    fill = 1
+
+
+class ZerosLike(FilledLike):
+    __slots__ = ()
+    fill = 0
+
+
+# Algebraic simplification used while building gradient graphs,
+# so gradients stay a small constant factor of the forward graph.
+def is_scalar_constant(node):
+    return isinstance(node, Constant) and np.ndim(node.value) == 0
+
+
+def simplify_mul(*nodes):
+    """
+    Mul with the scalar constants merged into one factor, a factor of
+    one dropped and a factor of minus one turned into Neg.
+    """
+    factors = []
+    scale = 1
+    for node in nodes:
+        if is_scalar_constant(node):
+            scale = scale * node.value
+        elif isinstance(node, Neg):
+            scale = -scale
+            factors.append(node._input_nodes[0])
+        else:
+            factors.append(node)
+
+    if not factors:
+        return Constant(scale, None)
+    if scale == -1:
+        return simplify_neg(simplify_mul(*factors))
+    if scale != 1:
+        factors.insert(0, Constant(scale, None))
+    if len(factors) == 1:
+        return factors[0]
+    return Mul(*factors)
+
+
+def simplify_neg(node):
+    if isinstance(node, Neg):
+        return node._input_nodes[0]
+    if is_scalar_constant(node):
+        return Constant(-node.value, None)
+    return Neg(node)
+
+
+def simplify_pow_minus_one(base_node, power_node):
+    # base ** (power - 1)
+    if not is_scalar_constant(power_node):
+        return Pow(base_node, Minus(power_node, Ones()))
+    power = power_node.value - 1
+    if power == 0:
+        return Ones()
+    if power == 1:
+        return base_node
+    return Pow(base_node, Constant(power, None))
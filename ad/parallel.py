@@ -0,0 +1,180 @@
+import multiprocessing
+import numpy as np
+from . import error
+from .graph import DefaultGraphSet, Graph
+from .ops import PlaceHolder
+from .serialize import load_node_table, node_table
+from .session import Session
+from .utils import flatten_iterable
+
+
+def _worker(connection, rows, wrt_rows):
+    # one copy of the graph and its gradients per process
+    nodes = load_node_table(rows)
+    root = nodes[-1]
+    wrt = [nodes[row] for row in wrt_rows]
+    grads = root.grad(*wrt)
+    graph = Graph()
+    graph.root = grads
+    session = Session(graph)
+    if root not in graph.tape.slot_of:
+        # gradients not depend on the value of root
+        root_graph = Graph()
+        root_graph.root = root
+        sessions = [session, Session(root_graph)]
+    else:
+        sessions = [session]
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        try:
+            parameters, feeds = message
+            for row, value in parameters.items():
+                nodes[row].value = value
+            feed_dict = {nodes[row]: value for row, value in feeds.items()}
+            for session in sessions:
+                session.run(session.graph.root, feed_dict)
+            if len(wrt) == 1:
+                values = [grads.value]
+            else:
+                values = [grad.value for grad in grads]
+            connection.send((root.value, values))
+        except Exception as e:
+            connection.send(e)
+    connection.close()
+
+
+class DataParallel(object):
+    def __init__(self, root, wrt=None, num_workers=None,
+                 reduction='sum', mp_context=None):
+        """
+        Split batches over a pool of worker processes, each worker
+        evaluates root and its gradients on a shard, the parent reduces
+        them. Workers live across runs, the graph is shipped once, a
+        run only sends changed parameter values and batch shards.
+        reduction is 'sum' for a root summed over examples or 'mean'
+        for a root averaged over examples.
+        """
+        if reduction not in ('sum', 'mean'):
+            raise ValueError(f'Unknown reduction {reduction}.')
+        if wrt is None:
+            wrt = root.trainable_parameters()
+        self.root = root
+        self.wrt = flatten_iterable(wrt)
+        self.reduction = reduction
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+
+        sorted_nodes = DefaultGraphSet().find_set_graph(root).sorted_nodes
+        row_of = {node: row for row, node in enumerate(sorted_nodes)}
+        self._placeholders = [(row_of[node], node) for node in sorted_nodes
+                              if isinstance(node, PlaceHolder)]
+        # wrt nodes out of the graph have zero gradients
+        self._wrt_rows = [row_of.get(node) for node in self.wrt]
+        rows = node_table(sorted_nodes)
+        wrt_rows = [row for row in self._wrt_rows if row is not None]
+
+        context = mp_context or multiprocessing.get_context()
+        self._connections = []
+        self._processes = []
+        for _ in range(self.num_workers):
+            connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(child_connection, rows, wrt_rows),
+                daemon=True)
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+        # parameter versions known by each worker
+        self._versions = [{} for _ in range(self.num_workers)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def split(self, feed_dict):
+        """
+        Split fed values with a batch axis into one shard per worker,
+        values without a batch axis go to every worker.
+        """
+        batched = {}
+        shared = {}
+        for row, node in self._placeholders:
+            value = node.fed_value(feed_dict)
+            if np.ndim(value) == 0 or np.shape(value) == node.shape:
+                shared[row] = value
+            else:
+                batched[row] = value
+
+        sizes = {len(value) for value in batched.values()}
+        if len(sizes) > 1:
+            raise error.PlaceholderValueError(
+                f'Batch sizes not match, got {sorted(sizes)}.')
+        batch_size = sizes.pop() if sizes else 1
+        num_shards = min(self.num_workers, batch_size)
+
+        shards = [dict(shared) for _ in range(num_shards)]
+        for row, value in batched.items():
+            for shard, part in zip(shards, np.array_split(value, num_shards)):
+                shard[row] = part
+        weights = [len(part) / batch_size for part in
+                   np.array_split(np.empty(batch_size), num_shards)]
+        return shards, weights
+
+    def run(self, feed_dict=None):
+        """
+        Return the value of root and the gradients of wrt nodes over
+        the whole batch, per example values of root are concatenated.
+        """
+        if not self._connections:
+            raise error.GraphError('DataParallel closed.')
+        shards, weights = self.split(feed_dict or {})
+
+        for i, feeds in enumerate(shards):
+            known = self._versions[i]
+            parameters = {}
+            for node, row in zip(self.wrt, self._wrt_rows):
+                if row is not None and known.get(row) != node._version:
+                    parameters[row] = node.value
+                    known[row] = node._version
+            self._connections[i].send((parameters, feeds))
+
+        results = [self._connections[i].recv() for i in range(len(shards))]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        if self.reduction == 'sum':
+            weights = [1] * len(shards)
+        values = [v for v, _ in results]
+        if np.ndim(values[0]) > 0 and len(values) > 1:
+            # one value per example
+            value = np.concatenate(values)
+        else:
+            value = sum(w * v for w, v in zip(weights, values))
+        grads = []
+        index = 0
+        for node, row in zip(self.wrt, self._wrt_rows):
+            if row is None:
+                grads.append(np.zeros_like(node.value))
+                continue
+            grads.append(sum(w * g[index]
+                             for w, (_, g) in zip(weights, results)))
+            index += 1
+        return value, grads
@@ -0,0 +1,123 @@
+import numpy as np
+from .graph import Graph
+from .ops import Operator, Constant, Add, Mul, Minus, Div, List, Tuple
+
+
+# operators whose value does not depend on the order of inputs
+COMMUTATIVE = (Add, Mul)
+# containers are never folded
+CONTAINERS = (List, Tuple)
+
+
+def is_constant(node):
+    return isinstance(node, Constant)
+
+
+def is_scalar(node, value):
+    return is_constant(node) and np.ndim(node.value) == 0 \
+        and node.value == value
+
+
+def fold_constant(node, input_nodes):
+    values = [input_node.value for input_node in input_nodes]
+    try:
+        value = node.forward(*values)
+    except (ValueError, ArithmeticError):
+        # keep it, the error raises when the graph runs
+        return None
+    return Constant(value, node.name)
+
+
+def drop_identities(node, input_nodes):
+    """
+    Drop scalar ones of Mul and zeros of Add, Minus and Div by them,
+    scalars never change the shape of the output.
+    """
+    if isinstance(node, Add):
+        input_nodes = [n for n in input_nodes if not is_scalar(n, 0)]
+        if not input_nodes:
+            return Constant(0., 'zero')
+    elif isinstance(node, Mul):
+        input_nodes = [n for n in input_nodes if not is_scalar(n, 1)]
+        if not input_nodes:
+            return Constant(1., 'one')
+    elif isinstance(node, Minus) and is_scalar(input_nodes[1], 0):
+        input_nodes = input_nodes[:1]
+    elif isinstance(node, Div) and is_scalar(input_nodes[1], 1):
+        input_nodes = input_nodes[:1]
+    else:
+        return input_nodes
+
+    if len(input_nodes) == 1:
+        return input_nodes[0]
+    return input_nodes
+
+
+def distinct_inputs(input_nodes):
+    """
+    Operators drop repeated inputs, a consumer of a shared node at two
+    positions gets a shallow copy of it for the second one.
+    """
+    seen = set()
+    for i, input_node in enumerate(input_nodes):
+        if input_node in seen and isinstance(input_node, Operator):
+            input_nodes[i] = input_node.rebuild(*input_node._input_nodes)
+        seen.add(input_nodes[i])
+    return input_nodes
+
+
+def subexpression_key(node, input_nodes):
+    ids = tuple(input_node.id for input_node in input_nodes)
+    if isinstance(node, COMMUTATIVE):
+        ids = tuple(sorted(ids))
+    key = (type(node), ids, node.attributes())
+    try:
+        hash(key)
+    except TypeError:
+        # unhashable settings, never shared
+        return None
+    return key
+
+
+def optimize(graph):
+    """
+    Return a smaller equivalent graph, constant subgraphs are folded,
+    identical (op, inputs) nodes are shared and identities dropped.
+    Leaves are shared with the original graph, so the optimized graph
+    sees new values of Variables and PlaceHolders.
+    """
+    if not isinstance(graph, Graph):
+        root, graph = graph, Graph()
+        graph.root = root
+
+    mapping = {}
+    subexpressions = {}
+    for node in graph.sorted_nodes:
+        if not isinstance(node, Operator):
+            mapping[node] = node
+            continue
+
+        input_nodes = [mapping[input_node]
+                       for input_node in node._input_nodes]
+        new_node = None
+        if not isinstance(node, CONTAINERS):
+            if all(is_constant(input_node) for input_node in input_nodes):
+                new_node = fold_constant(node, input_nodes)
+            if new_node is None:
+                input_nodes = drop_identities(node, input_nodes)
+                if not isinstance(input_nodes, list):
+                    new_node = input_nodes
+
+        if new_node is None:
+            input_nodes = distinct_inputs(input_nodes)
+            key = subexpression_key(node, input_nodes)
+            new_node = subexpressions.get(key)
+            if new_node is None:
+                new_node = node.rebuild(*input_nodes)
+                if key is not None:
+                    subexpressions[key] = new_node
+        mapping[node] = new_node
+
+    optimized = Graph()
+    optimized.root = mapping[graph.root]
+    return optimized
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from collections import namedtuple
+
+
+Event = namedtuple(
+    'Event', ['name', 'op', 'start', 'duration', 'nbytes', 'thread'])
+
+
+def _nbytes(value):
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is None:
+        if isinstance(value, tuple):
+            return sum(_nbytes(v) for v in value)
+        return 8
+    return nbytes
+
+
+class Profiler(object):
+    def __init__(self, name_budget=64):
+        """
+        Records wall time and output size of every operator evaluated
+        by a session, set it as the profiler of a Session to turn it
+        on, runs without a profiler take the plain path of the tape.
+        """
+        self.name_budget = name_budget
+        self.events = []
+        self._names = {}
+        self.origin = time.perf_counter_ns()
+
+    def clear(self):
+        self.events = []
+
+    def record(self, node, start, duration, value):
+        name = self._names.get(node.id)
+        if name is None:
+            name = self._names[node.id] = node.render_name(self.name_budget)
+        self.events.append(Event(
+            name, type(node).__name__, start, duration, _nbytes(value),
+            threading.get_ident()))
+
+    def stats(self, key='op'):
+        """
+        Return (key, calls, total ns, bytes) per op type or node name,
+        the most expensive first.
+        """
+        stats = {}
+        for event in self.events:
+            entry = stats.setdefault(getattr(event, key), [0, 0, 0])
+            entry[0] += 1
+            entry[1] += event.duration
+            entry[2] += event.nbytes
+        return sorted(((k, *v) for k, v in stats.items()),
+                      key=lambda item: item[2], reverse=True)
+
+    def summary(self, key='op', limit=20):
+        total = sum(event.duration for event in self.events) or 1
+        lines = [f'{key:<40} {"calls":>8} {"total ms":>10} '
+                 f'{"mean us":>10} {"%":>6} {"MB":>10}']
+        for name, calls, duration, nbytes in self.stats(key)[:limit]:
+            lines.append(
+                f'{name[:40]:<40} {calls:8d} {duration / 1e6:10.3f} '
+                f'{duration / calls / 1e3:10.2f} '
+                f'{100 * duration / total:6.1f} {nbytes / 1e6:10.3f}')
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """
+        Events in the Chrome trace event format, open the exported
+        file in chrome://tracing or Perfetto.
+        """
+        threads = {}
+        events = []
+        for event in self.events:
+            events.append({
+                'name': event.name,
+                'cat': event.op,
+                'ph': 'X',
+                'ts': (event.start - self.origin) / 1e3,
+                'dur': event.duration / 1e3,
+                'pid': 0,
+                'tid': threads.setdefault(event.thread, len(threads)),
+                'args': {'bytes': event.nbytes}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
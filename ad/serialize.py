@@ -0,0 +1,384 @@
+import gc
+import importlib
+import struct
+import weakref
+from contextlib import contextmanager
+import numpy as np
+from . import error
+from .graph import DefaultGraphSet, Graph
+from .ops import Node, Operator, Variable
+from .utils import flatten_iterable
+
+
+MAGIC = b'ADGRAPH\0'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sHII')     # magic, version, nodes, classes
+PARAMETERS_MAGIC = b'ADPARAM\0'
+_PARAMETERS_HEADER = struct.Struct('<8sHIQ')  # magic, version, count, data
+_ALIGNMENT = 64
+
+# value tags
+_NONE = 0
+_ARRAY = 1
+_SCALAR = 2     # python number, stored as a 0-d array
+_STRING = 3
+_TUPLE = 4      # count, then tagged items
+_GENERIC = 5    # numpy scalar, stored as a 0-d array
+
+
+@contextmanager
+def _paused_gc():
+    # no garbage while loading, skip cyclic collections over new nodes
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def node_table(sorted_nodes):
+    """
+    Flat table of topologically sorted nodes, a row is (module,
+    class name, name, input rows, value, attributes), values are
+    kept for leaves only.
+    """
+    row_of = {}
+    rows = []
+    for i, node in enumerate(sorted_nodes):
+        row_of[node] = i
+        cls = type(node)
+        inputs = tuple(row_of[input_node]
+                       for input_node in node._input_nodes)
+        value = None if isinstance(node, Operator) else node.value
+        rows.append((cls.__module__, cls.__qualname__, node._name,
+                     inputs, value, node.attributes()))
+    return rows
+
+
+def _node_classes(cls=Node):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _node_classes(subclass)
+
+
+def node_class(module, qualname):
+    """
+    Node class of a table row, only modules of this package are
+    imported and only Node subclasses are returned, a table never
+    names the code it runs.
+    """
+    package = __package__
+    if module != package and not module.startswith(package + '.'):
+        raise error.GraphError(f'{module}:{qualname} not a node class.')
+    importlib.import_module(module)
+    for cls in _node_classes():
+        if cls.__module__ == module and cls.__qualname__ == qualname:
+            return cls
+    raise error.GraphError(f'{module}:{qualname} not a node class.')
+
+
+def load_node_table(rows):
+    """
+    Rebuild the nodes of a table, return them in the order of rows,
+    the root is the last one. Edges are wired in bulk from the stored
+    inputs, which are unique per node, instead of one set_inputs each.
+    """
+    nodes = []
+    outputs = []
+    classes = {}
+    with _paused_gc():
+        for module, qualname, name, inputs, value, attributes in rows:
+            cls = classes.get((module, qualname))
+            if cls is None:
+                cls = node_class(module, qualname)
+                classes[module, qualname] = cls
+            node = cls.__new__(cls)
+            Node.__init__(node, name)
+            if inputs:
+                node._input_nodes = tuple([nodes[i] for i in inputs])
+                for i in inputs:
+                    outputs[i].append(node)
+            elif not issubclass(cls, Operator):
+                node.value = value
+            for slot, attribute in attributes:
+                setattr(node, slot, attribute)
+            nodes.append(node)
+            outputs.append([])
+        # same representation as _add_ref, a weak reference or a WeakSet
+        for node, consumers in zip(nodes, outputs):
+            if len(consumers) == 1:
+                node._outputs = weakref.ref(consumers[0])
+            elif consumers:
+                node._outputs = weakref.WeakSet(consumers)
+    return nodes
+
+
+def _contiguous(value):
+    # unlike np.ascontiguousarray, keep 0-d arrays 0-d
+    array = np.asarray(value)
+    if not array.flags.c_contiguous:
+        array = array.copy(order='C')
+    return array
+
+
+class _Writer(object):
+    def __init__(self):
+        self.chunks = []
+
+    def pack(self, fmt, *values):
+        self.chunks.append(struct.pack(fmt, *values))
+
+    def bytes(self, data):
+        self.pack('<Q', len(data))
+        self.chunks.append(data)
+
+    def array(self, array):
+        array = _contiguous(array)
+        self.bytes(array.dtype.str.encode())
+        self.pack('<B', array.ndim)
+        self.pack(f'<{array.ndim}Q', *array.shape)
+        self.bytes(array.tobytes())
+
+    def value(self, value):
+        if value is None:
+            self.pack('<B', _NONE)
+        elif isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            self.pack('<B', _ARRAY)
+            self.array(value)
+        elif isinstance(value, str):
+            self.pack('<B', _STRING)
+            self.bytes(value.encode())
+        elif isinstance(value, (bool, int, float, complex)):
+            self.pack('<B', _SCALAR)
+            self.array(np.asarray(value))
+        elif isinstance(value, np.generic) and not value.dtype.hasobject:
+            self.pack('<B', _GENERIC)
+            self.array(np.asarray(value))
+        elif isinstance(value, tuple):
+            self.pack('<B', _TUPLE)
+            self.pack('<I', len(value))
+            for item in value:
+                self.value(item)
+        else:
+            raise error.GraphError(
+                f'{type(value).__name__} value can not be serialized.')
+
+
+class _Reader(object):
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def bytes(self):
+        size, = self.unpack('<Q')
+        data = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def array(self):
+        dtype = np.dtype(bytes(self.bytes()).decode())
+        ndim, = self.unpack('<B')
+        shape = self.unpack(f'<{ndim}Q')
+        return np.frombuffer(self.bytes(), dtype).reshape(shape).copy()
+
+    def value(self):
+        tag, = self.unpack('<B')
+        if tag == _NONE:
+            return None
+        elif tag == _ARRAY:
+            return self.array()
+        elif tag == _SCALAR:
+            return self.array().item()
+        elif tag == _STRING:
+            return bytes(self.bytes()).decode()
+        elif tag == _GENERIC:
+            return self.array()[()]
+        elif tag == _TUPLE:
+            count, = self.unpack('<I')
+            return tuple(self.value() for _ in range(count))
+        else:
+            raise error.GraphError(f'Unknown value tag {tag}.')
+
+
+def dumps_graph(graph_or_root):
+    """
+    Encode the nodes of a graph in topological order: header, class
+    table, class of each node, edges, then names, leaf values and
+    attributes of the nodes having them.
+    """
+    if isinstance(graph_or_root, Graph):
+        sorted_nodes = graph_or_root.sorted_nodes
+    else:
+        graph = DefaultGraphSet().find_set_graph(graph_or_root)
+        sorted_nodes = graph.sorted_nodes
+    rows = node_table(sorted_nodes)
+
+    classes = {}
+    for module, qualname, *_ in rows:
+        classes.setdefault(f'{module}:{qualname}', len(classes))
+
+    writer = _Writer()
+    writer.pack(_HEADER.format, MAGIC, FORMAT_VERSION, len(rows),
+                len(classes))
+    for cls in classes:
+        writer.bytes(cls.encode())
+    writer.bytes(np.array([classes[f'{row[0]}:{row[1]}'] for row in rows],
+                          dtype='<u4').tobytes())
+    # edges, inputs of all nodes and offsets into them
+    writer.bytes(np.cumsum([0] + [len(row[3]) for row in rows],
+                           dtype='<u8').tobytes())
+    writer.bytes(np.array([i for row in rows for i in row[3]],
+                          dtype='<u4').tobytes())
+    # sparse sections, most operators have no name, value or attribute
+    for field in (2, 4):
+        indices = [i for i, row in enumerate(rows) if row[field] is not None]
+        writer.bytes(np.array(indices, dtype='<u4').tobytes())
+        for i in indices:
+            writer.value(rows[i][field])
+    indices = [i for i, row in enumerate(rows) if row[5]]
+    writer.bytes(np.array(indices, dtype='<u4').tobytes())
+    for i in indices:
+        writer.value(rows[i][5])
+    return b''.join(writer.chunks)
+
+
+def loads_graph(data):
+    """
+    Decode a graph, the node order is the stored topological order,
+    so the graph is ready to run without sorting.
+    """
+    reader = _Reader(data)
+    magic, version, num_nodes, num_classes = reader.unpack(_HEADER.format)
+    if magic != MAGIC:
+        raise error.GraphError('Not a serialized graph.')
+    if version > FORMAT_VERSION:
+        raise error.GraphError(
+            f'Graph format version {version} not supported, '
+            f'expect {FORMAT_VERSION} or older.')
+
+    classes = [bytes(reader.bytes()).decode().split(':')
+               for _ in range(num_classes)]
+    class_ids = np.frombuffer(reader.bytes(), '<u4').tolist()
+    offsets = np.frombuffer(reader.bytes(), '<u8').tolist()
+    edges = np.frombuffer(reader.bytes(), '<u4').tolist()
+
+    with _paused_gc():
+        names = {i: reader.value()
+                 for i in np.frombuffer(reader.bytes(), '<u4').tolist()}
+        values = {i: reader.value()
+                  for i in np.frombuffer(reader.bytes(), '<u4').tolist()}
+        attributes = {i: reader.value()
+                      for i in np.frombuffer(reader.bytes(), '<u4').tolist()}
+        rows = [classes[class_ids[i]] + [names.get(i),
+                edges[offsets[i]:offsets[i + 1]], values.get(i),
+                attributes.get(i, ())] for i in range(num_nodes)]
+
+    nodes = load_node_table(rows)
+    graph = Graph()
+    graph.root = nodes[-1] if nodes else None
+    graph._sorted_nodes = nodes
+    return graph
+
+
+def save_graph(graph_or_root, path):
+    with open(path, 'wb') as f:
+        f.write(dumps_graph(graph_or_root))
+
+
+def load_graph(path):
+    with open(path, 'rb') as f:
+        return loads_graph(f.read())
+
+
+def _align(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _parameters(root_or_parameters):
+    if isinstance(root_or_parameters, Node) and \
+            not isinstance(root_or_parameters, Variable):
+        return root_or_parameters.trainable_parameters()
+    return flatten_iterable(root_or_parameters)
+
+
+def save_parameters(root_or_parameters, path):
+    """
+    Write the values of Variables, or the trainable parameters of a
+    root, into one file: header, index of names, dtypes, shapes and
+    offsets, then the raw values, each aligned to 64 bytes.
+    """
+    parameters = _parameters(root_or_parameters)
+    arrays = [_contiguous(node.value) for node in parameters]
+    writer = _Writer()
+    offsets = []
+    size = 0
+    for node, array in zip(parameters, arrays):
+        if array.dtype.hasobject:
+            raise error.GraphError(f'{node.name} not a numeric value.')
+        size = _align(size)
+        offsets.append(size)
+        writer.bytes(node.name.encode())
+        writer.bytes(array.dtype.str.encode())
+        writer.pack('<B', array.ndim)
+        writer.pack(f'<{array.ndim}Q', *array.shape)
+        writer.pack('<Q', size)
+        size += array.nbytes
+    index = b''.join(writer.chunks)
+    data_start = _align(_PARAMETERS_HEADER.size + len(index))
+
+    with open(path, 'wb') as f:
+        f.write(_PARAMETERS_HEADER.pack(PARAMETERS_MAGIC, FORMAT_VERSION,
+                                        len(parameters), data_start))
+        f.write(index)
+        for array, offset in zip(arrays, offsets):
+            f.seek(data_start + offset)
+            f.write(array.data)
+        f.truncate(data_start + size)
+
+
+def load_parameters(root_or_parameters, path, mode='r'):
+    """
+    Map a parameter file into memory, the value of each Variable
+    becomes a view of the mapping, no data is copied, processes
+    mapping the same file read only share its pages. mode is the
+    mode of np.memmap, 'r+' writes updates back to the file, 'c'
+    keeps them private.
+    """
+    parameters = _parameters(root_or_parameters)
+    mapping = np.memmap(path, dtype=np.uint8, mode=mode)
+    reader = _Reader(mapping)
+    magic, version, count, data_start = reader.unpack(
+        _PARAMETERS_HEADER.format)
+    if magic != PARAMETERS_MAGIC:
+        raise error.GraphError('Not a parameter file.')
+    if version > FORMAT_VERSION:
+        raise error.GraphError(
+            f'Parameter format version {version} not supported, '
+            f'expect {FORMAT_VERSION} or older.')
+    if count != len(parameters):
+        raise error.GraphError(
+            f'{len(parameters)} parameters but {count} saved.')
+
+    views = []
+    for node in parameters:
+        name = bytes(reader.bytes()).decode()
+        dtype = np.dtype(bytes(reader.bytes()).decode())
+        ndim, = reader.unpack('<B')
+        shape = reader.unpack(f'<{ndim}Q')
+        offset, = reader.unpack('<Q')
+        if name != node.name:
+            raise error.GraphError(
+                f'Parameter {node.name} not match saved {name}.')
+        views.append(np.ndarray(shape, dtype, buffer=mapping,
+                                offset=data_start + offset))
+    # bump versions only once all parameters matched
+    for node, view in zip(parameters, views):
+        node.value = view
+    return parameters
@@ -1,39 +1,211 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from . import error
+from .compiler import LOAD
 from .graph import DefaultGraphSet
+from .ops import Broadcast, PlaceHolder, Unbroadcast
 
 
 _default_graph_set = DefaultGraphSet()
 
 
 class Session(object):
-    def __init__(self, graph=None):
+    def __init__(self, graph=None, num_threads=None, profiler=None,
+                 memory_planning=False):
+        """
+        num_threads > 1 runs independent nodes of a graph in a thread
+        pool, worth it for ndarray values since numpy releases the GIL.
+        A profiler records the time of every operator of a run.
+        With memory_planning values are freed after their last use and
+        buffers reused, only the value of the operation is kept. The
+        planned run is sequential and not profiled, it is not combined
+        with num_threads > 1 or a profiler.
+        """
+        if memory_planning and (profiler is not None
+                                or (num_threads or 1) > 1):
+            raise ValueError('memory_planning can not be combined with '
+                             'num_threads or a profiler.')
+        self.profiler = profiler
+        self.memory_planning = memory_planning
         self._current_root = None
         self._graph = None
         self._graph_set = None
+        self._executor = None
+        self.num_threads = num_threads or 1
         if graph is not None:
             self._graph = graph
         else:
             self._graph_set = _default_graph_set
+        if self.num_threads > 1:
+            self._executor = ThreadPoolExecutor(self.num_threads)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        pass
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
     @property
     def graph(self):
+        return self.graph_of(self._current_root)
+
+    def graph_of(self, operation):
         if self._graph is not None:
             return self._graph
         else:
-            return self._graph_set.find_set_graph(
-                self._current_root)
+            return self._graph_set.find_set_graph(operation)
+
+    def run(self, operation, feed_dict=None):
+        """
+        feed_dict maps PlaceHolder nodes or their names to values,
+        values with a leading batch axis are evaluated in one pass.
+        """
+        self._current_root = operation
+        tape = self.graph_of(operation).tape
+        with tape.lock:
+            self._execute(tape, feed_dict or {})
+            return tape.root
+
+    def _execute(self, tape, feed_dict):
+        # the values of the last run belong to the tape, shared by all
+        # sessions, runs of a tape not overlap. Fed values stay in the
+        # slots of the run, runs of other tapes may share placeholders.
+        if self.memory_planning:
+            value = tape.execute_planned(feed_dict)
+            tape.root.value = value
+            return value
+        tape.run(feed_dict, self._executor, self.num_threads, self.profiler)
+        return tape.slots[-1]
 
-    def run(self, operation, feed_dict={}):
+    def _run_value(self, operation, feed_dict):
+        # the value of the run itself, the root node may be written by
+        # the runs of other tapes it is part of
         self._current_root = operation
-        out_node = None
+        tape = self.graph_of(operation).tape
+        with tape.lock:
+            return self._execute(tape, feed_dict or {})
+
+    async def run_async(self, operation, feed_dict=None):
+        """
+        Run in a worker thread without blocking the event loop, return
+        the value of operation, the node is shared by concurrent runs.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._run_value, operation, feed_dict)
+
+
+class Batcher(object):
+    def __init__(self, session, max_batch_size=32, max_delay=0.002):
+        """
+        Dynamic batching for serving, concurrent requests against the
+        same root are collected for up to max_delay seconds or
+        max_batch_size requests, fed values of one example are stacked
+        on a leading batch axis and evaluated in one run. The value of
+        an operation fed this way must keep the batch axis first.
+        """
+        self.session = session
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending = {}
+        self._timers = {}
+        # running batches, referenced until done
+        self._tasks = set()
+
+    def feeds_of(self, operation, feed_dict):
+        """
+        Values of the placeholders of operation, keyed by node whether
+        fed by node or by name.
+        """
+        feeds = {}
+        for node in self.session.graph_of(operation).tape.placeholders:
+            if node in feed_dict:
+                feeds[node] = feed_dict[node]
+            elif node.name in feed_dict:
+                feeds[node] = feed_dict[node.name]
+            else:
+                raise error.PlaceholderValueError(
+                    f'Key {node.name} not found in feed_dict.')
+        return feeds
+
+    def is_batched(self, operation):
+        """
+        Whether the value of operation keeps the stacked batch axis,
+        followed from the placeholders through the tape: elementwise
+        operators and Broadcast keep it, Unbroadcast has the shape of
+        its second input. Raise if operation depends on the fed
+        values but loses the axis, the examples would be mixed.
+        """
+        tape = self.session.graph_of(operation).tape
+        depends = [False] * tape.num_slots
+        batched = [False] * tape.num_slots
+        for opcode, out, _, args in tape.instructions:
+            node = tape.outputs[out]
+            if opcode == LOAD:
+                depends[out] = batched[out] = isinstance(node, PlaceHolder)
+                continue
+            depends[out] = any(depends[i] for i in args)
+            if isinstance(node, Unbroadcast):
+                batched[out] = batched[args[-1]]
+            elif node.elementwise or isinstance(node, Broadcast):
+                batched[out] = any(batched[i] for i in args)
+        if depends[-1] and not batched[-1]:
+            raise error.GraphError(
+                f'{operation.name} has no batch axis, not batchable.')
+        return batched[-1]
+
+    async def run(self, operation, feed_dict=None):
+        """
+        Return the value of operation for one example.
+        """
+        feeds = self.feeds_of(operation, feed_dict or {})
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = operation.id
+        requests = self._pending.setdefault(key, [])
+        requests.append((feeds, future))
+        if len(requests) >= self.max_batch_size:
+            self._flush(operation)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(
+                self.max_delay, self._flush, operation)
+        return await future
+
+    def _flush(self, operation):
+        key = operation.id
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self._pending.pop(key, [])
+        if requests:
+            task = asyncio.ensure_future(self._run_batch(operation, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
 
-        for node in self.graph.sorted_nodes:
-            node.eval()
-            out_node = node
+    async def _run_batch(self, operation, requests):
+        futures = [future for _, future in requests]
+        try:
+            feed_dict = {node: np.stack([feeds[node] for feeds, _ in requests])
+                         for node in requests[0][0]}
+            # not depend on the fed values, shared by all requests
+            batched = self.is_batched(operation)
+            value = await self.session.run_async(operation, feed_dict)
+            if batched and np.shape(value)[:1] != (len(requests),):
+                raise error.GraphError(
+                    f'{operation.name} has no batch axis of size '
+                    f'{len(requests)}, got shape {np.shape(value)}.')
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
 
-        return out_node
+        for i, future in enumerate(futures):
+            if not future.done():
+                future.set_result(value[i] if batched else value)
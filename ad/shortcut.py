@@ -1,7 +1,7 @@
 from .ops import *      # noqa: F403
 
 
-__all__ = ['constant', 'variable', 'add', 'neg',
+__all__ = ['constant', 'variable', 'placeholder', 'add', 'neg',
            'minus', 'mul', 'div', 'pow', 'log',
            'ones', 'zeros', 'reciprocal']
 
@@ -14,6 +14,10 @@ def variable(value, name=None):
     return Variable(value, name)    # noqa: F405
 
 
+def placeholder(name, shape=None):
+    return PlaceHolder(name, shape)     # noqa: F405
+
+
 def add(*nodes):
     return Add(*nodes)      # noqa: F405
 
@@ -1,4 +1,5 @@
 from typing import Iterable
+import numpy as np
 
 
 def flatten_iterable(nodes):
@@ -14,7 +15,36 @@ def flatten_iterable(nodes):
 
 
 def find_node(target, nodes):
-    for node in nodes:
-        if node.__hash__ == target.__hash__:
-            return True
-    return False
+    # O(1) for dict or set backed adjacency
+    return target in nodes
+
+
+def unbroadcast(value, shape):
+    # sum value over the broadcasted axes, so it matches shape
+    value_shape = np.shape(value)
+    if value_shape == shape:
+        return value
+
+    leading = max(len(value_shape) - len(shape), 0)
+    if leading:
+        value = np.sum(value, axis=tuple(range(leading)))
+        value_shape = value_shape[leading:]
+
+    offset = len(shape) - len(value_shape)
+    axes = tuple(i for i, dim in enumerate(value_shape)
+                 if dim != 1 and shape[i + offset] == 1)
+    if axes:
+        value = np.sum(value, axis=axes, keepdims=True)
+
+    if np.shape(value) != shape:
+        # value is smaller than shape, e.g. the seed of root
+        value = np.broadcast_to(value, shape)
+    return value
+
+
+def broadcast_like(value, output):
+    # a tangent of only the broadcast inputs, shaped like the output
+    shape = np.shape(output)
+    if np.shape(value) != shape:
+        value = np.broadcast_to(value, shape)
+    return value
@@ -0,0 +1,51 @@
+"""
+Peak memory and time of the gradient of a long chain of ndarray
+nodes, symbolic gradient graph against checkpointed recomputation.
+
+    PYTHONPATH=. python benchmark/checkpoint.py [length] [size]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import ad
+from ad.checkpoint import CheckpointedGradient
+
+
+def chain(length, size):
+    x = ad.variable(np.random.rand(size) + 1., 'x')
+    scale = ad.constant(0.5, 'scale')
+    one = ad.constant(1., 'one')
+    node = x
+    for _ in range(length):
+        node = ad.add(ad.log(ad.add(ad.mul(node, scale), one)), one)
+    return x, node
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(length, size):
+    x, root = chain(length, size)
+
+    def symbolic():
+        with ad.Session() as sess:
+            sess.run(root.grad(x))
+
+    grad = CheckpointedGradient(root, x)
+    for name, fn in (('symbolic', symbolic), ('checkpointed', grad)):
+        elapsed, peak = measure(fn)
+        print(f'{name:>12}: {elapsed * 1e3:8.1f} ms, '
+              f'peak {peak / 1e6:8.1f} MB')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
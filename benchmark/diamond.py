@@ -0,0 +1,44 @@
+"""
+Evaluate deep diamond shaped graphs, every level reads the previous
+level twice, so recursive evaluation costs 2 ** depth.
+
+    PYTHONPATH=. python benchmark/diamond.py
+"""
+import time
+import ad
+
+
+def diamond(depth):
+    node = ad.variable(1., 'x')
+    half = ad.constant(0.5, 'half')
+    for _ in range(depth):
+        left = ad.mul(node, half)
+        right = ad.mul(node, half)
+        node = ad.add(left, right)
+    return node
+
+
+def bench(depth, repeat=10):
+    root = diamond(depth)
+    x, = root.trainable_parameters()
+    with ad.Session() as sess:
+        sess.run(root)     # compile
+        start = time.perf_counter()
+        for _ in range(repeat):
+            x.value = x.value    # invalidate the whole graph
+            sess.run(root)
+        elapsed = (time.perf_counter() - start) / repeat
+    return elapsed
+
+
+def main():
+    last = None
+    for depth in (50, 100, 200, 400):
+        elapsed = bench(depth)
+        ratio = '' if last is None else f'x{elapsed / last:.2f}'
+        print(f'depth {depth:5d}: {elapsed * 1e3:8.3f} ms {ratio}')
+        last = elapsed
+
+
+if __name__ == '__main__':
+    main()
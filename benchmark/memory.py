@@ -0,0 +1,39 @@
+"""
+Peak memory and time of a run of a long elementwise ndarray graph,
+plain tape against the memory planned one.
+
+    PYTHONPATH=. python benchmark/memory.py [length] [size]
+"""
+import sys
+import time
+import tracemalloc
+import ad
+from checkpoint import chain
+
+
+def measure(root, memory_planning, repeat=3):
+    with ad.Session(memory_planning=memory_planning) as sess:
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for node in root.trainable_parameters():
+                node.value = node.value
+            sess.run(root)
+        elapsed = (time.perf_counter() - start) / repeat
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(length, size):
+    _, root = chain(length, size)
+    for memory_planning in (False, True):
+        elapsed, peak = measure(root, memory_planning)
+        name = 'planned' if memory_planning else 'plain'
+        print(f'{name:>8}: {elapsed * 1e3:8.1f} ms, '
+              f'peak {peak / 1e6:8.1f} MB')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
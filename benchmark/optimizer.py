@@ -0,0 +1,36 @@
+"""
+Update step of many parameters, assigning a new value per Variable
+against the fused optimizer on one contiguous buffer.
+
+    PYTHONPATH=. python benchmark/optimizer.py [parameters] [size]
+"""
+import sys
+import time
+import numpy as np
+import ad
+from ad import nn
+
+
+def main(num_parameters, size, repeat=20):
+    parameters = [ad.variable(np.random.rand(size), f'w{i}')
+                  for i in range(num_parameters)]
+    grads = [np.random.rand(size) for _ in range(num_parameters)]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for node, grad in zip(parameters, grads):
+            node.value = node.value - 0.01 * grad
+    loop = (time.perf_counter() - start) / repeat
+
+    optimizer = nn.SGD(parameters, lr=0.01)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        optimizer.step(grads)
+    fused = (time.perf_counter() - start) / repeat
+    print(f'{num_parameters} x {size}: per variable {loop * 1e3:.2f} ms, '
+          f'fused {fused * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,44 @@
+"""
+Wide graph of independent ndarray branches, run with a growing thread
+pool, numpy releases the GIL in elementwise kernels.
+
+    PYTHONPATH=. python benchmark/parallel.py
+"""
+import os
+import time
+import numpy as np
+import ad
+
+
+def wide_graph(width, size, depth=4):
+    x = ad.variable(np.random.rand(size) + 1., 'x')
+    branches = []
+    for i in range(width):
+        node = ad.mul(x, ad.constant(float(i + 1), f'c{i}'))
+        for _ in range(depth):
+            node = ad.log(ad.add(ad.pow(node, ad.constant(2., 'two')), x))
+        branches.append(node)
+    return x, ad.add(*branches)
+
+
+def bench(root, x, num_threads, repeat=5):
+    with ad.Session(num_threads=num_threads) as sess:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            x.value = x.value    # invalidate the whole graph
+            sess.run(root)
+        return (time.perf_counter() - start) / repeat
+
+
+def main():
+    x, root = wide_graph(width=16, size=200000)
+    base = None
+    for num_threads in sorted({1, 2, 4, os.cpu_count() or 1}):
+        elapsed = bench(root, x, num_threads)
+        base = base or elapsed
+        print(f'{num_threads:3d} threads: {elapsed * 1e3:8.1f} ms '
+              f'speedup x{base / elapsed:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Cold start of a graph, building it in python and sorting it against
+loading it from the binary format.
+
+    PYTHONPATH=. python benchmark/serialize.py [nodes]
+"""
+import sys
+import time
+import ad
+from ad import algorithms, serialize
+from topsort import random_dag
+
+
+def main(size):
+    start = time.perf_counter()
+    root = random_dag(size)
+    algorithms.topsort(root)
+    built = time.perf_counter() - start
+
+    data = serialize.dumps_graph(root)
+    start = time.perf_counter()
+    graph = serialize.loads_graph(data)
+    loaded = time.perf_counter() - start
+
+    with ad.Session(graph) as sess:
+        sess.run(graph.root)
+    print(f'{len(graph.sorted_nodes)} nodes, {len(data) / 1e6:.1f} MB')
+    print(f'build + topsort: {built * 1e3:9.1f} ms')
+    print(f'load:            {loaded * 1e3:9.1f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,159 @@
+"""
+Build, topsort, run and grad of synthetic graphs from 1e2 nodes up,
+with peak memory, compared against a stored baseline.
+
+    PYTHONPATH=. python benchmark/suite.py                 # compare
+    PYTHONPATH=. python benchmark/suite.py --save          # new baseline
+    PYTHONPATH=. python benchmark/suite.py --max-size 1000000
+
+Exits with status 1 when a timing or peak memory is worse than the
+baseline by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import ad
+from ad import algorithms
+from topsort import chain, random_dag
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+STAGES = ('build', 'topsort', 'run', 'grad')
+
+
+def fan_in(size):
+    return ad.add(*[ad.variable(1., f'x{i}') for i in range(size - 1)])
+
+
+def diamond(size):
+    node = ad.variable(1., 'x')
+    half = ad.constant(0.5, 'half')
+    for _ in range((size - 2) // 3):
+        node = ad.add(ad.mul(node, half), ad.mul(node, half))
+    return node
+
+
+GRAPHS = (chain, fan_in, diamond, random_dag)
+
+
+def run_stages(build, size):
+    """
+    Return the seconds of every stage, the run stage is a full replay
+    of a compiled tape, the grad stage builds and runs the gradients.
+    """
+    times = {}
+    start = time.perf_counter()
+    root = build(size)
+    times['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    algorithms.topsort(root)
+    times['topsort'] = time.perf_counter() - start
+
+    with ad.Session() as sess:
+        sess.run(root)      # compile
+        for node in root.trainable_parameters():
+            node.value = node.value
+        start = time.perf_counter()
+        sess.run(root)
+        times['run'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sess.run(root.grad())
+        times['grad'] = time.perf_counter() - start
+    return times
+
+
+def peak_memory(build, size):
+    gc.collect()
+    tracemalloc.start()
+    root = build(size)
+    with ad.Session() as sess:
+        sess.run(root.grad())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del root
+    return peak
+
+
+def measure(max_size, repeat):
+    results = {}
+    size = 100
+    while size <= max_size:
+        for build in GRAPHS:
+            key = f'{build.__name__}/{size}'
+            # best of repeat, less noise from other processes
+            runs = [run_stages(build, size) for _ in range(repeat)]
+            result = {stage: min(run[stage] for run in runs)
+                      for stage in STAGES}
+            result['peak_bytes'] = peak_memory(build, size)
+            results[key] = result
+            print(f'{key:>20} ' + ' '.join(
+                f'{stage} {result[stage] * 1e3:9.2f} ms'
+                for stage in STAGES) +
+                f' peak {result["peak_bytes"] / 1e6:8.2f} MB', flush=True)
+            gc.collect()
+        size *= 10
+    return results
+
+
+def compare(results, baseline, tolerance, min_time):
+    """
+    Return the regressions, (key, metric, baseline, current).
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric, value in result.items():
+            expect = baseline[key].get(metric)
+            if expect is None:
+                continue
+            if metric != 'peak_bytes' and value < min_time:
+                # too short to tell
+                continue
+            if value > expect * tolerance:
+                regressions.append((key, metric, expect, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--max-size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='allowed ratio to the baseline')
+    parser.add_argument('--min-time', type=float, default=1e-3,
+                        help='timings shorter than this are not compared')
+    args = parser.parse_args(argv)
+
+    results = measure(args.max_size, args.repeat)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, run with --save')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_time)
+    for key, metric, expect, value in regressions:
+        print(f'REGRESSION {key} {metric}: {expect:.4g} -> {value:.4g} '
+              f'(x{value / expect:.2f})')
+    if not regressions:
+        print('no regression')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Topological sort of chains and wide random DAGs, time per node should
+stay flat as the graph grows.
+
+    PYTHONPATH=. python benchmark/topsort.py [max nodes]
+"""
+import random
+import sys
+import time
+import ad
+from ad import algorithms
+
+
+def chain(size):
+    node = ad.variable(1., 'x')
+    for _ in range(size - 1):
+        node = ad.neg(node)
+    return node
+
+
+def random_dag(size, fan_in=2, seed=0):
+    # every node reads the previous one, so all are reachable from root
+    rng = random.Random(seed)
+    nodes = [ad.variable(1., 'x')]
+    for _ in range(size - 1):
+        inputs = set(rng.choice(nodes) for _ in range(fan_in - 1))
+        inputs.add(nodes[-1])
+        nodes.append(ad.add(*inputs))
+    return nodes[-1]
+
+
+def bench(build, size):
+    root = build(size)
+    start = time.perf_counter()
+    sorted_nodes = algorithms.topsort(root)
+    elapsed = time.perf_counter() - start
+    return len(sorted_nodes), elapsed
+
+
+def main(max_size):
+    size = 1000
+    while size <= max_size:
+        for build in (chain, random_dag):
+            num_nodes, elapsed = bench(build, size)
+            print(f'{build.__name__:>10} {num_nodes:8d} nodes: '
+                  f'{elapsed * 1e3:9.2f} ms '
+                  f'{elapsed / num_nodes * 1e9:7.1f} ns/node')
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -18,4 +18,5 @@ setup(name=NAME,
       author_email=AUTHOR_EMAIL,
       license=LICENSE,
       url=URL,
+      install_requires=["numpy"],
       packages=find_packages(exclude=["test"]))
@@ -1,5 +1,6 @@
 import ad
 from ad import algorithms
+import sys
 import time
 
 
@@ -65,3 +66,71 @@ def test_topsort():
         if i == 3:
             # latest node is '4'
             assert node.name == '4'
+
+
+def test_topsort_deep_chain():
+    depth = 10 * sys.getrecursionlimit()
+    x = ad.variable(1., 'x')
+    node = x
+    for _ in range(depth):
+        node = ad.neg(node)
+
+    outs = algorithms.topsort(node)
+    assert len(outs) == depth + 1
+    assert outs[0] is x
+    assert outs[-1] is node
+
+    with ad.Session() as sess:
+        assert sess.run(node).value == 1.
+        assert sess.run(node.grad(x)).value == 1.
+    assert node.trainable_parameters() == [x]
+
+
+def test_node_identity():
+    node1 = ad.Node('same')
+    node2 = ad.Node('same')
+
+    assert node1.id < node2.id
+    assert hash(node1) == node1.id
+    assert node1 == node1
+    assert node1 != node2
+    assert len({node1, node2}) == 2
+
+
+def test_high_fan_out():
+    bias = ad.variable(1., 'bias')
+    terms = [ad.add(ad.constant(float(i), 'c'), bias) for i in range(1000)]
+    total = ad.add(*terms)
+
+    assert len(bias._output_nodes) == 1000
+    assert len(total._input_nodes) == 1000
+    for term in terms:
+        assert term.has_input(bias)
+        assert not bias.has_input(term)
+
+    # wiring the same edge twice is a no-op
+    terms[0].set_input(bias)
+    bias.set_output(terms[0])
+    assert len(bias._output_nodes) == 1000
+    assert len(terms[0]._input_nodes) == 2
+
+
+def test_compact_nodes():
+    a = ad.variable(1., 'a')
+    b = ad.constant(2., 'b')
+    c = ad.add(ad.mul(a, b), ad.log(a))
+
+    for node in algorithms.topsort(c):
+        assert not hasattr(node, '__dict__')
+    assert c.name == 'add(mul(a,b),log(a))'
+
+    # single output is stored inline, more outputs in a set
+    assert a._outputs is not None and len(a._output_nodes) == 2
+    assert b._outputs() is c._input_nodes[0]
+    assert list(b._output_nodes) == [c._input_nodes[0]]
+
+    node = a
+    for _ in range(10 * sys.getrecursionlimit()):
+        node = ad.neg(node)
+    assert node._name is None
+    assert len(node.name) == ad.ops.MAX_NAME_LENGTH
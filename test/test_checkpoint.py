@@ -0,0 +1,70 @@
+import numpy as np
+import ad
+from ad.checkpoint import CheckpointedGradient, checkpointed_grad
+
+
+def symbolic(root, wrt, feed_dict=None):
+    with ad.Session() as sess:
+        value = np.array(sess.run(root, feed_dict).value)
+        grads = sess.run(root.grad(*wrt), feed_dict)
+    if len(wrt) == 1:
+        grads = [grads]
+    return value, [np.array(grad.value) for grad in grads]
+
+
+def long_chain(x, w, length):
+    node = x
+    for i in range(length):
+        if i % 3 == 0:
+            node = ad.mul(node, w)
+        elif i % 3 == 1:
+            node = ad.add(ad.log(ad.add(ad.pow(node, ad.constant(2.)),
+                                        ad.constant(1.))), ad.constant(1.))
+        else:
+            node = ad.div(node, ad.minus(ad.constant(0.5), ad.neg(w)))
+    return node
+
+
+def test_checkpoint_chain():
+    x = ad.variable(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(np.array([0.5, 1.5, 1.]), 'w')
+    root = long_chain(x, w, 60)
+    expect_value, expect_grads = symbolic(root, [x, w])
+
+    grad = CheckpointedGradient(root, [x, w])
+    value, grads = grad()
+    assert np.allclose(value, expect_value)
+    for g, expect in zip(grads, expect_grads):
+        assert np.allclose(g, expect, atol=0)
+    # about sqrt(n) values held, not n
+    num_operators = len(grad.tape) - len(grad.tape.leaves)
+    assert len(grad.checkpoints) < num_operators / 5
+    assert grad.max_live < num_operators / 3
+
+    # again after a change of parameters
+    w.value = w.value * 0.5
+    expect_value, expect_grads = symbolic(root, [x, w])
+    value, grads = grad()
+    assert np.allclose(value, expect_value)
+    assert np.allclose(grads[1], expect_grads[1])
+
+
+def test_checkpoint_dag():
+    x = ad.placeholder('x', shape=(2,))
+    w = ad.variable(np.array([1., 2.]), 'w')
+    b = ad.variable(0.5, 'b')
+    c = ad.variable(3., 'c')
+    # skip connections reach across segments
+    first = ad.add(ad.mul(x, w), b)
+    second = ad.log(ad.pow(first, ad.constant(2.)))
+    third = ad.mul(second, first)
+    root = ad.add(ad.div(third, ad.add(second, ad.constant(5.))), first)
+    feed_dict = {'x': np.array([[1., 2.], [3., 4.]])}
+    expect_value, expect_grads = symbolic(root, [w, b, c], feed_dict)
+
+    value, grads = checkpointed_grad(root, [w, b, c], feed_dict,
+                                     checkpoints=[second])
+    assert np.allclose(value, expect_value)
+    for g, expect in zip(grads, expect_grads):
+        assert np.allclose(g, expect)
+    assert np.shape(grads[1]) == ()
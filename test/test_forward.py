@@ -0,0 +1,111 @@
+import numpy as np
+import ad
+from ad.forward import jvp, hvp, HessianVectorProduct
+
+
+def numerical_jvp(root, node, tangent, eps=1e-6):
+    value = node.value
+    node.value = value + eps * tangent
+    with ad.Session() as sess:
+        plus = np.array(sess.run(root).value)
+    node.value = value - eps * tangent
+    with ad.Session() as sess:
+        minus = np.array(sess.run(root).value)
+    node.value = value
+    return (plus - minus) / (2 * eps)
+
+
+def test_jvp_ops():
+    x = ad.variable(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(2., 'w')
+    c = ad.log(ad.add(ad.div(ad.pow(x, w), ad.minus(w, ad.neg(x))),
+                      ad.mul(x, w)))
+
+    value, tangent = jvp(c, w, 1.)
+    with ad.Session() as sess:
+        assert np.allclose(value, sess.run(c).value)
+    assert np.allclose(tangent, numerical_jvp(c, w, 1.))
+
+    direction = np.array([0.5, -1., 2.])
+    _, tangent = jvp(c, [x, w], [direction, 0.])
+    assert np.allclose(tangent, numerical_jvp(c, x, direction))
+
+
+def test_jvp_broadcast():
+    # only the scalar input carries a tangent
+    x = ad.constant(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(2., 'w')
+    for root, expect in ((ad.add(x, w), 1.), (ad.minus(x, w), -1.),
+                         (ad.minus(w, x), 1.), (ad.mul(x, w), x.value)):
+        _, tangent = jvp(root, w, 1.)
+        assert np.shape(tangent) == (3,)
+        assert np.allclose(tangent, expect)
+
+
+def test_jvp_many_outputs():
+    x = ad.variable(3., 'x')
+    y = ad.constant(2., 'y')
+    outputs = ad.ops.Tuple(ad.mul(x, y), ad.log(x), ad.pow(y, x), y)
+
+    first = ad.Node('first')
+    value, tangent = jvp(outputs, x, 1.)
+    # no gradient node is built
+    assert ad.Node('second').id == first.id + 1
+
+    assert np.allclose(value, [6., np.log(3.), 8., 2.])
+    assert np.allclose(tangent, [2., 1 / 3., 8. * np.log(2.), 0.])
+
+
+def test_jvp_placeholder():
+    x = ad.placeholder('x', shape=(2,))
+    w = ad.variable(np.array([1., 2.]), 'w')
+    c = ad.mul(x, w)
+    batch = np.arange(6.).reshape(3, 2)
+
+    value, tangent = jvp(c, w, np.array([1., 0.]), {x: batch})
+    assert np.allclose(value, batch * w.value)
+    assert np.allclose(tangent, batch * [1., 0.])
+
+    _, tangent = jvp(c, ad.variable(1., 'unused'), 1., {x: batch})
+    assert np.array_equal(tangent, np.zeros((3, 2)))
+
+
+def test_hvp():
+    x = ad.variable(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(np.array([0.5, -1., 2.]), 'w')
+    # f = sum(w * x ** 3 + log(x) * x), hessian wrt x is diagonal
+    f = ad.add(ad.mul(w, ad.pow(x, ad.constant(3.))),
+               ad.mul(ad.log(x), x))
+
+    v = np.array([1., -2., 0.5])
+    hv_x, hv_w = hvp(f, [x, w], [v, np.zeros(3)])
+    x_value = x.value
+    assert np.allclose(hv_x, (6 * w.value * x_value + 1 / x_value) * v)
+    # cross term d2f / dw dx
+    assert np.allclose(hv_w, 3 * x_value ** 2 * v)
+
+    product = HessianVectorProduct(f, w)
+    assert np.allclose(product(v)[0], 0.)
+
+
+def test_second_order_grad():
+    x = ad.variable(2., 'x')
+    y = ad.variable(3., 'y')
+    f = ad.div(ad.pow(x, y), ad.log(x))
+
+    df_dx = f.grad(x)
+    d2f_dx2, d2f_dxdy = df_dx.grad(x, y)
+
+    def value(x_value, y_value):
+        return x_value ** y_value / np.log(x_value)
+
+    eps = 1e-4
+    with ad.Session() as sess:
+        d2f_dx2_out = sess.run(d2f_dx2).value
+        d2f_dxdy_out = sess.run(d2f_dxdy).value
+
+    expected = (value(2 + eps, 3) - 2 * value(2, 3) + value(2 - eps, 3))
+    assert np.isclose(d2f_dx2_out, expected / eps ** 2, rtol=1e-4)
+    expected = (value(2 + eps, 3 + eps) - value(2 + eps, 3 - eps)
+                - value(2 - eps, 3 + eps) + value(2 - eps, 3 - eps))
+    assert np.isclose(d2f_dxdy_out, expected / (4 * eps ** 2), rtol=1e-4)
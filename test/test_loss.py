@@ -0,0 +1,154 @@
+import numpy as np
+import ad
+from ad import loss, serialize
+from ad.checkpoint import checkpointed_grad
+from ad.forward import HessianVectorProduct, hvp, jvp
+
+
+def numerical_grad(root, node, eps=1e-6):
+    value = np.array(node.value, dtype=float)
+    grad = np.zeros_like(value)
+    for index in np.ndindex(value.shape):
+        for sign in (1, -1):
+            shifted = value.copy()
+            shifted[index] += sign * eps
+            node.value = shifted
+            with ad.Session() as sess:
+                grad[index] += sign * sess.run(root).value / (2 * eps)
+    node.value = value
+    return grad
+
+
+def losses():
+    rng = np.random.RandomState(0)
+    prediction = ad.variable(rng.randn(4, 3), 'prediction')
+    target = ad.variable(rng.randn(4, 3), 'target')
+    labels = ad.constant(np.eye(3)[[0, 2, 1, 2]], 'labels')
+    binary = ad.constant(np.array([[1., 0., 1.]]), 'binary')
+    return prediction, target, [
+        loss.mse(prediction, target),
+        loss.huber(prediction, target, delta=0.5, reduction='sum'),
+        loss.softmax_cross_entropy(prediction, labels),
+        loss.logistic(prediction, binary),
+    ]
+
+
+def test_loss_values():
+    prediction, target, (mse, huber, cross_entropy, logistic) = losses()
+    p, t = prediction.value, target.value
+    with ad.Session() as sess:
+        assert np.isclose(sess.run(mse).value, np.mean((p - t) ** 2))
+        r = np.abs(p - t)
+        expect = np.sum(np.where(r <= 0.5, 0.5 * r ** 2, 0.5 * (r - 0.25)))
+        assert np.isclose(sess.run(huber).value, expect)
+        probs = np.exp(p) / np.sum(np.exp(p), axis=1, keepdims=True)
+        expect = -np.mean(np.log(probs[range(4), [0, 2, 1, 2]]))
+        assert np.isclose(sess.run(cross_entropy).value, expect)
+        sigmoid = 1 / (1 + np.exp(-p))
+        y = np.array([[1., 0., 1.]])
+        expect = -np.mean(y * np.log(sigmoid) + (1 - y) * np.log(1 - sigmoid))
+        assert np.isclose(sess.run(logistic).value, expect)
+
+
+def test_loss_stable():
+    logits = ad.variable(np.array([[1000., -1000., 0.]]), 'logits')
+    labels = ad.constant(np.array([[0., 1., 0.]]), 'labels')
+    cross_entropy = loss.softmax_cross_entropy(logits, labels)
+    logistic = loss.logistic(logits, ad.constant(np.ones((1, 3))))
+    with ad.Session() as sess:
+        assert np.isclose(sess.run(cross_entropy).value, 2000.)
+        assert np.isfinite(sess.run(logistic).value)
+        grads = sess.run(cross_entropy.grad(logits)).value
+    assert np.all(np.isfinite(grads))
+    assert np.allclose(grads, [[1., -1., 0.]])
+
+
+def test_loss_grads():
+    prediction, target, roots = losses()
+    for root in roots:
+        with ad.Session() as sess:
+            grad_root = sess.run(root.grad(prediction, target))
+        grads = list(grad_root)
+        # one loss node, one kernel node per gradient
+        grad_ops = {type(node) for node in ad.algorithms.topsort(grad_root)}
+        assert grad_ops <= {loss.LossGrad, type(root), ad.OnesLike,
+                            ad.ZerosLike, ad.Zeros, ad.Variable,
+                            ad.Constant, ad.ops.Tuple}
+        for node, grad in zip((prediction, target), grads):
+            expect = numerical_grad(root, node)
+            assert np.allclose(grad.value, expect, atol=1e-5)
+
+        # the numeric kernels agree with the graph
+        _, numeric = checkpointed_grad(root, [prediction])
+        assert np.allclose(numeric[0], grads[0].value)
+        direction = np.ones((4, 3))
+        _, tangent = jvp(root, prediction, direction)
+        assert np.isclose(tangent, np.sum(grads[0].value * direction))
+
+
+def test_loss_serialize():
+    prediction, target, roots = losses()
+    huber = roots[1]
+    data = serialize.dumps_graph(huber.grad(prediction))
+    graph = serialize.loads_graph(data)
+    with ad.Session(graph) as sess:
+        value = sess.run(graph.root).value
+    loaded = [node for node in graph.sorted_nodes
+              if isinstance(node, loss.HuberLoss)][0]
+    assert loaded.delta == 0.5 and loaded.reduction == 'sum'
+    with ad.Session() as sess:
+        assert np.allclose(value, sess.run(huber.grad(prediction)).value)
+
+
+def test_loss_hvp():
+    prediction, target, roots = losses()
+    direction = np.random.RandomState(1).randn(4, 3)
+    for root in roots:
+        product, = hvp(root, prediction, direction)
+
+        # central difference of the gradient along direction
+        grad = root.grad(prediction)
+        value = prediction.value
+        eps = 1e-6
+        prediction.value = value + eps * direction
+        with ad.Session() as sess:
+            plus = np.array(sess.run(grad).value)
+        prediction.value = value - eps * direction
+        with ad.Session() as sess:
+            minus = np.array(sess.run(grad).value)
+        prediction.value = value
+        assert np.allclose(product, (plus - minus) / (2 * eps), atol=1e-5)
+
+    # mixed, the gradient wrt prediction along the target
+    products = HessianVectorProduct(roots[0], [prediction, target])(
+        [np.zeros((4, 3)), direction])
+    assert np.allclose(products[0], -2 * direction / 12)
+    assert np.allclose(products[1], 2 * direction / 12)
+
+
+def test_loss_kernels(monkeypatch):
+    calls = []
+    gradient = loss.MeanSquaredError.gradient
+
+    def counted_gradient(self, index, prediction, target):
+        calls.append(index)
+        return gradient(self, index, prediction, target)
+
+    monkeypatch.setattr(loss.MeanSquaredError, 'gradient', counted_gradient)
+    prediction, target, roots = losses()
+    with ad.Session() as sess:
+        sess.run(roots[0].grad(prediction))
+        assert calls == [0]
+        sess.run(roots[0].grad(prediction, target))
+        assert sorted(calls[1:]) == [0, 1]
+
+
+def test_loss_dtype():
+    prediction = ad.variable(np.ones((2, 3), dtype=np.float32), 'p')
+    labels = ad.constant(np.eye(3, dtype=np.float32)[[0, 1]], 'labels')
+    for root in (loss.mse(prediction, labels),
+                 loss.softmax_cross_entropy(prediction, labels)):
+        with ad.Session() as sess:
+            assert sess.run(root).value.dtype == np.float32
+        assert root.input_grad(0, prediction.value,
+                               labels.value).dtype == np.float32
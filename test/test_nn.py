@@ -0,0 +1,86 @@
+import numpy as np
+import ad
+from ad import nn
+
+
+def quadratic():
+    # sum of (w * x - 3) ** 2 + (b - 1) ** 2
+    x = ad.constant(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(np.zeros(3), 'w')
+    b = ad.variable(0., 'b')
+    loss = ad.add(
+        ad.pow(ad.minus(ad.mul(w, x), ad.constant(3.)), ad.constant(2.)),
+        ad.pow(ad.minus(b, ad.constant(1.)), ad.constant(2.)))
+    return loss, w, b
+
+
+def train(optimizer, loss, steps):
+    grads = loss.grad(*optimizer.parameters)
+    with ad.Session() as sess:
+        for _ in range(steps):
+            optimizer.step(sess.run(grads))
+
+
+def test_optimizer_buffer():
+    loss, w, b = quadratic()
+    optimizer = nn.SGD(loss, lr=0.01)
+    assert optimizer.parameters == [w, b]
+    assert np.shares_memory(w.value, optimizer.flat)
+    assert np.shares_memory(b.value, optimizer.flat)
+    assert np.shape(b.value) == ()
+
+    version = w._version
+    optimizer.step([np.ones(3), 2.])
+    assert np.allclose(w.value, -0.01) and np.isclose(b.value, -0.02)
+    assert w._version != version
+
+    # a value assigned by hand is taken into the buffer
+    w.value = np.ones(3)
+    optimizer.step([np.zeros(3), 0.])
+    assert np.allclose(w.value, 1.)
+    assert np.shares_memory(w.value, optimizer.flat)
+
+
+def test_optimizer_dtype():
+    w = ad.variable(np.zeros(3, np.float32), 'w')
+    b = ad.variable(np.float32(0.), 'b')
+    optimizer = nn.Adam([w, b], lr=0.01)
+    assert optimizer.flat.dtype == np.float32
+    optimizer.step([np.ones(3, np.float32), np.float32(1.)])
+    assert w.value.dtype == np.float32
+
+    n = ad.variable(np.arange(3), 'n')
+    assert nn.SGD([n], lr=0.1).flat.dtype == np.float64
+
+
+def test_optimizers_converge():
+    for optimizer, steps in ((nn.SGD, 200), (nn.Momentum, 200),
+                             (nn.Adam, 2000)):
+        loss, w, b = quadratic()
+        lr = 0.1 if optimizer is nn.Adam else 0.02
+        train(optimizer([w, b], lr=lr), loss, steps)
+        assert np.allclose(w.value, [3., 1.5, 1.], atol=1e-3)
+        assert np.isclose(b.value, 1., atol=1e-3)
+
+
+def test_adam_reference():
+    loss, w, b = quadratic()
+    optimizer = nn.Adam([w, b], lr=0.05)
+    grad_fn = loss.grad(w, b)
+
+    params = [np.zeros(3), np.zeros(())]
+    m = [np.zeros(3), np.zeros(())]
+    v = [np.zeros(3), np.zeros(())]
+    with ad.Session() as sess:
+        for t in range(1, 6):
+            grads = [np.array(g.value) for g in sess.run(grad_fn)]
+            optimizer.step(grads)
+            for i, g in enumerate(grads):
+                m[i] = 0.9 * m[i] + 0.1 * g
+                v[i] = 0.999 * v[i] + 0.001 * g * g
+                m_hat = m[i] / (1 - 0.9 ** t)
+                v_hat = v[i] / (1 - 0.999 ** t)
+                params[i] = params[i] - 0.05 * m_hat / (
+                    np.sqrt(v_hat) + 1e-8)
+    assert np.allclose(w.value, params[0], rtol=1e-5)
+    assert np.allclose(b.value, params[1], rtol=1e-5)
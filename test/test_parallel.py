@@ -0,0 +1,43 @@
+import numpy as np
+import ad
+from ad.parallel import DataParallel
+
+
+def test_data_parallel():
+    x = ad.placeholder('x', shape=(3,))
+    y = ad.placeholder('y', shape=(3,))
+    w = ad.variable(np.array([1., -2., 0.5]), 'w')
+    b = ad.variable(0.3, 'b')
+    loss = ad.pow(ad.minus(ad.add(ad.mul(x, w), b), y), ad.constant(2.))
+
+    rng = np.random.RandomState(0)
+    feed_dict = {'x': rng.randn(7, 3), 'y': rng.randn(7, 3)}
+    with ad.Session() as sess:
+        expect_value = np.array(sess.run(loss, feed_dict).value)
+        expect_grads = [np.array(g.value) for g in
+                        sess.run(loss.grad(w, b), feed_dict)]
+
+    with DataParallel(loss, [w, b], num_workers=3) as parallel:
+        value, grads = parallel.run(feed_dict)
+        assert np.allclose(value, expect_value)
+        for grad, expect in zip(grads, expect_grads):
+            assert np.allclose(grad, expect)
+
+        # workers see updated parameters
+        w.value = w.value * 2
+        with ad.Session() as sess:
+            expect = sess.run(loss.grad(w), feed_dict).value
+        _, grads = parallel.run(feed_dict)
+        assert np.allclose(grads[0], expect)
+
+
+def test_data_parallel_mean():
+    x = ad.placeholder('x')
+    w = ad.variable(2., 'w')
+    loss = ad.mul(w, x)
+
+    with DataParallel(loss, w, num_workers=2, reduction='mean') as parallel:
+        # a batch smaller than the pool
+        value, grads = parallel.run({x: np.array([[3.]])})
+        assert np.allclose(value, 6.)
+        assert np.allclose(grads[0], 3.)
@@ -0,0 +1,71 @@
+import numpy as np
+import ad
+from ad import algorithms
+from ad.passes import optimize
+
+
+def test_fold_constants():
+    a = ad.constant(2., 'a')
+    b = ad.constant(3., 'b')
+    x = ad.variable(np.array([1., 2.]), 'x')
+    c = ad.mul(ad.log(ad.add(a, b)), x)
+
+    graph = optimize(c)
+    nodes = graph.sorted_nodes
+    assert len(nodes) == 3
+    assert isinstance(nodes[0], ad.Constant)
+    assert nodes[0].value == np.log(5.)
+
+    with ad.Session(graph) as sess:
+        assert np.allclose(sess.run(c).value, np.log(5.) * x.value)
+        x.value = np.array([3., 4.])
+        assert np.allclose(sess.run(c).value, np.log(5.) * x.value)
+
+
+def test_common_subexpressions():
+    x = ad.variable(2., 'x')
+    y = ad.variable(3., 'y')
+    left = ad.log(ad.mul(x, y))
+    right = ad.log(ad.mul(y, x))
+    c = ad.add(left, right, ad.minus(x, y), ad.minus(y, x))
+
+    graph = optimize(c)
+    # mul shared, log read twice by add is copied, minus is not
+    # commutative
+    assert len(graph.sorted_nodes) == len(algorithms.topsort(c)) - 1
+
+    with ad.Session(graph) as sess:
+        assert sess.run(c).value == 2 * np.log(6.)
+
+
+def test_drop_identities():
+    x = ad.variable(2., 'x')
+    c = ad.add(ad.mul(x, ad.ones('one')), ad.zeros('zero'))
+    graph = optimize(c)
+    assert graph.root is x
+
+    d = ad.div(ad.minus(x, ad.zeros('zero')), ad.ones('one'))
+    assert optimize(d).root is x
+
+    # ones with a shape may broadcast, keep them
+    e = ad.mul(x, ad.constant(np.ones(3), 'ones'))
+    graph = optimize(e)
+    assert isinstance(graph.root, ad.Mul)
+    with ad.Session(graph) as sess:
+        assert sess.run(e).value.shape == (3,)
+
+
+def test_optimize_grad():
+    x = ad.variable(np.array([1., 2., 3.]), 'x')
+    w = ad.variable(2., 'w')
+    k = ad.add(ad.constant(2., 'a'), ad.constant(3., 'b'))
+    c = ad.log(ad.mul(x, w, k))
+    dc_dw = c.grad(w)
+
+    graph = optimize(dc_dw)
+    assert len(graph.sorted_nodes) < len(algorithms.topsort(dc_dw))
+
+    with ad.Session() as sess:
+        expected = sess.run(dc_dw).value
+    with ad.Session(graph) as sess:
+        assert np.allclose(sess.run(dc_dw).value, expected)
@@ -0,0 +1,37 @@
+import json
+import numpy as np
+import ad
+
+
+def test_profiler(tmp_path):
+    x = ad.variable(np.arange(1., 5.), 'x')
+    y = ad.log(ad.mul(x, ad.add(x, ad.constant(1.))))
+    profiler = ad.Profiler()
+
+    with ad.Session(profiler=profiler) as sess:
+        sess.run(y)
+        sess.run(y.grad(x))
+    ops = [event.op for event in profiler.events]
+    assert ops[:3] == ['Add', 'Mul', 'Log']
+    assert all(event.duration >= 0 for event in profiler.events)
+    assert profiler.events[0].nbytes == 32
+
+    stats = {op: calls for op, calls, _, _ in profiler.stats()}
+    # the gradient graph evaluates the forward nodes again
+    assert stats['Log'] == 2 and stats['Div'] == 1
+    assert 'Log' in profiler.summary()
+    assert 'log(mul(x,add(x,1.0)))' in profiler.summary(key='name')
+
+    path = tmp_path / 'trace.json'
+    profiler.export_chrome_trace(path)
+    with open(path) as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == len(profiler.events)
+    assert trace['traceEvents'][0]['ph'] == 'X'
+
+    # off, nothing recorded
+    profiler.clear()
+    x.value = x.value * 2
+    with ad.Session() as sess:
+        sess.run(y)
+    assert profiler.events == []
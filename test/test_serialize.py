@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import ad
+from ad import serialize
+
+
+def test_serialize_graph(tmp_path):
+    x = ad.placeholder('x', shape=(2,))
+    w = ad.variable(np.array([1.5, -2.]), 'w')
+    b = ad.variable(3., 'b')
+    y = ad.log(ad.pow(ad.add(ad.mul(x, w), b), ad.constant(2.)))
+    root = ad.ops.Tuple(y, y.grad(w, b))
+    feed_dict = {'x': np.array([[1., 2.], [3., 4.]])}
+    with ad.Session() as sess:
+        expect = [np.array(node.value) for node in
+                  ad.utils.flatten_iterable(sess.run(root, feed_dict))]
+
+    path = tmp_path / 'graph.bin'
+    serialize.save_graph(root, path)
+    graph = serialize.load_graph(path)
+    assert len(graph.sorted_nodes) == len(ad.algorithms.topsort(root))
+    assert graph.root is graph.sorted_nodes[-1]
+    assert all(node is not root for node in graph.sorted_nodes)
+    original = ad.algorithms.topsort(root)
+    index = {node: i for i, node in enumerate(graph.sorted_nodes)}
+    for node, loaded in zip(original, graph.sorted_nodes):
+        assert [index[n] for n in loaded._input_nodes] == \
+            [original.index(n) for n in node._input_nodes]
+        assert sorted(index[n] for n in loaded._output_nodes) == \
+            sorted(original.index(n) for n in node._output_nodes)
+
+    placeholder = graph.sorted_nodes[0]
+    assert isinstance(placeholder, ad.PlaceHolder)
+    assert placeholder.name == 'x' and placeholder.shape == (2,)
+    with ad.Session(graph) as sess:
+        values = ad.utils.flatten_iterable(sess.run(graph.root, feed_dict))
+    for value, node in zip(expect, values):
+        assert np.allclose(value, node.value)
+
+
+def test_serialize_version():
+    data = bytearray(serialize.dumps_graph(ad.neg(ad.variable(1., 'x'))))
+    assert serialize.loads_graph(bytes(data)).root.eval().value == -1.
+
+    data[8] = serialize.FORMAT_VERSION + 1
+    with pytest.raises(ad.error.GraphError):
+        serialize.loads_graph(bytes(data))
+    with pytest.raises(ad.error.GraphError):
+        serialize.loads_graph(b'not a graph' + bytes(data))
+
+
+def test_serialize_untrusted_class():
+    data = serialize.dumps_graph(ad.neg(ad.variable(1., 'x')))
+    for tampered in (b'os:system', b'ad.utils:flatten_iterable'):
+        original = b'ad.ops:Neg'
+        changed = data.replace(
+            len(original).to_bytes(8, 'little') + original,
+            len(tampered).to_bytes(8, 'little') + tampered)
+        assert changed != data
+        with pytest.raises(ad.error.GraphError):
+            serialize.loads_graph(changed)
+
+    with pytest.raises(ad.error.GraphError):
+        serialize.dumps_graph(ad.variable(object(), 'x'))
+
+
+def test_serialize_parameters(tmp_path):
+    x = ad.placeholder('x', shape=(3,))
+    w = ad.variable(np.arange(6.).reshape(2, 3), 'w')
+    b = ad.variable(np.array([1, 2], dtype=np.int32), 'b')
+    s = ad.variable(0.5, 's')
+    root = ad.mul(ad.add(ad.mul(x, w), ad.constant(1.)), s)
+    parameters = root.trainable_parameters()
+    expect = [np.array(node.value) for node in parameters]
+
+    path = tmp_path / 'parameters.bin'
+    serialize.save_parameters(root, path)
+    for node in parameters:
+        node.value = node.value * 0
+    serialize.load_parameters(root, path)
+    for node, value in zip(parameters, expect):
+        assert np.array_equal(node.value, value)
+        assert node.value.shape == value.shape
+        assert node.value.dtype == value.dtype
+        assert isinstance(node.value.base, np.memmap)
+        assert not node.value.flags.writeable
+    with ad.Session() as sess:
+        value = sess.run(root, {'x': np.ones(3)}).value
+    assert np.allclose(value, (np.arange(6.).reshape(2, 3) + 1) * 0.5)
+
+    with pytest.raises(ad.error.GraphError):
+        serialize.load_parameters([s, w, b], path)
+    with pytest.raises(ad.error.GraphError):
+        serialize.load_parameters([w], path)
+
+
+def test_serialize_parameters_writable(tmp_path):
+    w = ad.variable(np.zeros(4), 'w')
+    path = tmp_path / 'parameters.bin'
+    serialize.save_parameters([w], path)
+
+    serialize.load_parameters([w], path, mode='r+')
+    w.value[1] = 3.
+    w.value.base.flush()
+    serialize.load_parameters([w], path)
+    assert np.array_equal(w.value, [0., 3., 0., 0.])
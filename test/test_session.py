@@ -1,5 +1,12 @@
+import asyncio
+import gc
 import math
+import threading
+import numpy as np
+import pytest
 import ad
+import ad.checkpoint
+import ad.forward
 
 
 def test_session_default_graph():
@@ -139,3 +146,384 @@ def test_session_reciprocal():
         c_out = sess.run(c)
 
     assert c_out.value == c_true.value
+
+
+def test_session_ndarray_broadcast():
+    x = np.array([[1., 2., 3.], [4., 5., 6.]])
+    w = np.array([0.5, 1., 2.])
+    a = ad.constant(x, 'a')
+    b = ad.constant(w, 'b')
+
+    c = ad.add(ad.mul(a, b), ad.neg(a))
+    d = ad.log(ad.div(ad.pow(a, b), ad.minus(a, ad.constant(-1))))
+
+    with ad.Session() as sess:
+        c_out = sess.run(c)
+        d_out = sess.run(d)
+
+    assert c_out.value.shape == (2, 3)
+    assert np.allclose(c_out.value, x * w - x)
+    assert np.allclose(d_out.value, np.log(x ** w / (x + 1)))
+
+
+def test_session_feed_dict():
+    x = ad.placeholder('x')
+    y = ad.placeholder('y')
+    c = ad.mul(ad.add(x, ad.constant(1)), y)
+
+    with ad.Session() as sess:
+        c_out = sess.run(c, feed_dict={'x': 1, y: 3})
+        assert c_out.value == 6
+        c_out = sess.run(c, feed_dict={x: 2, 'y': 3})
+        assert c_out.value == 9
+
+        with pytest.raises(ad.error.PlaceholderValueError):
+            sess.run(c, feed_dict={'x': 1})
+
+
+def test_session_feed_batch():
+    x = ad.placeholder('x', shape=(3,))
+    w = ad.variable(np.array([1., 2., 3.]), 'w')
+    c = ad.log(ad.mul(x, w))
+    batch = np.random.rand(8, 3) + 0.5
+
+    with ad.Session() as sess:
+        c_out = sess.run(c, feed_dict={x: batch})
+        assert c_out.value.shape == (8, 3)
+        assert np.allclose(c_out.value, np.log(batch * w.value))
+
+        dc_dw_out = sess.run(c.grad(w), feed_dict={x: batch})
+        assert dc_dw_out.value.shape == (3,)
+        assert np.allclose(dc_dw_out.value, 8 / w.value)
+
+        with pytest.raises(ad.error.PlaceholderValueError):
+            sess.run(c, feed_dict={x: np.ones((8, 4))})
+
+
+def test_session_tape_cached():
+    x = ad.placeholder('x')
+    w = ad.variable(2., 'w')
+    c = ad.log(ad.add(ad.mul(x, w), ad.neg(w), ad.constant(3)))
+
+    graph = ad.Graph()
+    graph.root = c
+    tape = graph.tape
+    assert len(tape) == len(graph.sorted_nodes)
+
+    with ad.Session(graph) as sess:
+        c_out = sess.run(c, feed_dict={x: 1.})
+        assert graph.tape is tape
+        assert c_out is c
+        assert c_out.value == math.log(3)
+
+        w.value = 3.
+        c_out = sess.run(c, feed_dict={x: 2.})
+        assert graph.tape is tape
+        assert c_out.value == math.log(6)
+
+
+def test_session_diamond_linear(monkeypatch):
+    calls = []
+    forward = ad.Add.forward
+
+    def counted_forward(self, *values):
+        calls.append(self)
+        return forward(self, *values)
+
+    monkeypatch.setattr(ad.Add, 'forward', counted_forward)
+
+    depth = 64
+    x = ad.variable(1., 'x')
+    half = ad.constant(0.5, 'half')
+    node = x
+    for _ in range(depth):
+        left = ad.mul(node, half)
+        right = ad.mul(node, half)
+        node = ad.add(left, right)
+
+    with ad.Session() as sess:
+        assert sess.run(node).value == 1.
+    assert len(calls) == depth
+
+    x.value = 2.
+    assert node().value == 2.
+    assert len(calls) == 2 * depth
+    assert len(node.name) <= ad.ops.MAX_NAME_LENGTH
+
+
+def test_session_incremental(monkeypatch):
+    calls = []
+    forward = ad.Log.forward
+
+    def counted_forward(self, *values):
+        calls.append(self)
+        return forward(self, *values)
+
+    monkeypatch.setattr(ad.Log, 'forward', counted_forward)
+
+    x = ad.placeholder('x')
+    a = ad.variable(2., 'a')
+    b = ad.variable(3., 'b')
+    log_a = ad.log(a)
+    log_b = ad.log(b)
+    c = ad.add(log_a, log_b, x)
+
+    with ad.Session() as sess:
+        assert sess.run(c, {x: 1.}).value == 1. + math.log(6.)
+        assert len(calls) == 2
+
+        # nothing but the placeholder changed
+        assert sess.run(c, {x: 2.}).value == 2. + math.log(6.)
+        assert len(calls) == 2
+
+        b.value = 4.
+        assert sess.run(c, {x: 2.}).value == 2. + math.log(8.)
+        assert calls[2:] == [log_b]
+        assert log_a.value == math.log(2.)
+
+
+def test_session_alternate_grad(monkeypatch):
+    calls = []
+    forward = ad.Log.forward
+
+    def counted_forward(self, *values):
+        calls.append(self)
+        return forward(self, *values)
+
+    monkeypatch.setattr(ad.Log, 'forward', counted_forward)
+
+    x = ad.variable(2., 'x')
+    f = ad.mul(ad.log(ad.add(x, ad.constant(1.))), x)
+    g = f.grad(x)
+
+    with ad.Session() as sess:
+        sess.run(f)
+        sess.run(g)
+        count = len(calls)
+        # loss and gradient in turn, nothing changed
+        for _ in range(3):
+            sess.run(f)
+            sess.run(g)
+        assert len(calls) == count
+
+        x.value = 3.
+        assert math.isclose(sess.run(f).value, 3. * math.log(4.))
+        assert math.isclose(sess.run(g).value, math.log(4.) + 3. / 4.)
+        assert len(calls) == count + 2
+
+
+def test_graph_set_lru():
+    graph_set = ad.graph.GraphSet(max_size=2)
+    a = ad.neg(ad.constant(1, 'a'))
+    b = ad.neg(ad.constant(2, 'b'))
+    c = ad.neg(ad.constant(3, 'c'))
+
+    graph_a = graph_set.find_set_graph(a)
+    assert graph_set.find_set_graph(a) is graph_a
+    assert graph_set.current is graph_a
+    graph_set.find_set_graph(b)
+    graph_set.find_set_graph(a)
+    graph_set.find_set_graph(c)    # evict b
+
+    info = graph_set.cache_info()
+    assert (info.hits, info.misses, info.evictions) == (2, 3, 1)
+    assert info.size == 2
+    assert graph_set not in b._graphs
+    assert graph_set.find_set_graph(a) is graph_a
+
+
+def test_graph_sets_share_roots():
+    first = ad.graph.GraphSet()
+    second = ad.graph.GraphSet(max_size=1)
+    root = ad.neg(ad.constant(1, 'a'))
+    graph = first.find_set_graph(root)
+    other = second.find_set_graph(root)
+    assert other is not graph
+    assert first.find_set_graph(root) is graph
+
+    # evicted from the second set only
+    second.find_set_graph(ad.neg(root))
+    assert first.find_set_graph(root) is graph
+    assert first.cache_info().hits == 2
+    assert second.find_set_graph(root) is not other
+
+
+def test_graph_set_weak_roots():
+    graph_set = ad.graph.GraphSet()
+    x = ad.variable(1., 'x')
+    root = ad.log(ad.add(x, ad.constant(1.)))
+    graph_set.find_set_graph(root).tape.run({})
+    assert len(graph_set) == 1
+
+    del root
+    gc.collect()
+    # x is still alive, but the graph is collected with its root
+    assert len(graph_set) == 0
+    assert len(x._output_nodes) == 0
+
+    # a root collected while the set is locked is removed afterwards
+    root = ad.neg(x)
+    graph_set.find_set_graph(root)
+    with graph_set._lock:
+        del root
+        gc.collect()
+        assert len(graph_set._graphs) == 1
+    assert len(graph_set) == 0
+
+
+def test_session_threads():
+    x = ad.variable(np.arange(1., 5.), 'x')
+    branches = []
+    for i in range(8):
+        node = ad.mul(x, ad.constant(float(i + 1)))
+        branches.append(ad.log(ad.add(node, x)))
+    root = ad.add(*branches)
+    expected = sum(np.log((i + 2) * x.value) for i in range(8))
+
+    graph = ad.Graph()
+    graph.root = root
+    levels = graph.tape.levels
+    assert levels[-1] == max(levels)
+
+    with ad.Session(num_threads=4) as sess:
+        assert np.allclose(sess.run(root).value, expected)
+        x.value = x.value * 2
+        expected = sum(np.log((i + 2) * x.value) for i in range(8))
+        assert np.allclose(sess.run(root).value, expected)
+
+        x.value = -x.value
+        with pytest.raises(ValueError):
+            sess.run(root)
+
+
+def test_session_batcher():
+    x = ad.placeholder('x', shape=(2,))
+    w = ad.variable(np.array([1., 3.]), 'w')
+    root = ad.add(ad.mul(x, w), ad.constant(1.))
+
+    sess = ad.Session()
+    calls = []
+    execute = sess._execute
+
+    def counted_execute(tape, feed_dict):
+        calls.append(len(next(iter(feed_dict.values()))))
+        return execute(tape, feed_dict)
+    sess._execute = counted_execute
+
+    async def serve():
+        batcher = ad.Batcher(sess, max_batch_size=4, max_delay=0.01)
+        examples = [np.array([i, -i], dtype=float) for i in range(6)]
+        # fed by node or by name
+        values = await asyncio.gather(
+            *[batcher.run(root, {x if i % 2 else 'x': e})
+              for i, e in enumerate(examples)])
+        return examples, values
+
+    examples, values = asyncio.run(serve())
+    assert sorted(calls) == [2, 4]
+    for example, value in zip(examples, values):
+        assert np.allclose(value, example * w.value + 1.)
+
+    value = asyncio.run(sess.run_async(root, {'x': np.ones(2)}))
+    assert np.allclose(value, [2., 4.])
+
+    # summed over the batch, the first axis only looks like a batch
+    total = ad.ops.Unbroadcast(ad.mul(x, w), w)
+
+    async def serve_total():
+        batcher = ad.Batcher(ad.Session(), max_batch_size=2)
+        return await asyncio.gather(
+            *[batcher.run(total, {x: np.ones(2)}) for _ in range(2)],
+            return_exceptions=True)
+
+    results = asyncio.run(serve_total())
+    assert all(isinstance(r, ad.error.GraphError) for r in results)
+
+    # no placeholder, one value for all
+    scaled = ad.mul(w, ad.constant(2.))
+
+    async def serve_scaled():
+        batcher = ad.Batcher(ad.Session(), max_batch_size=2)
+        return await asyncio.gather(
+            *[batcher.run(scaled) for _ in range(2)])
+
+    for value in asyncio.run(serve_scaled()):
+        assert np.allclose(value, [2., 6.])
+
+
+def test_session_shared_tape():
+    x = ad.placeholder('x')
+    root = ad.mul(ad.log(x), ad.constant(2.))
+    sessions = [ad.Session(), ad.Session()]
+    assert sessions[0].graph_of(root).tape is sessions[1].graph_of(root).tape
+    errors = []
+
+    def serve(sess, value):
+        for _ in range(200):
+            result = sess._run_value(root, {x: np.full(3, value)})
+            if not np.allclose(result, 2 * np.log(value)):
+                errors.append(result)
+
+    threads = [threading.Thread(target=serve, args=(sess, value))
+               for sess, value in zip(sessions, (2., 5.))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_session_shared_placeholder():
+    x = ad.placeholder('x')
+    first = ad.mul(ad.log(x), ad.constant(2.))
+    second = ad.mul(ad.log(x), ad.constant(3.))
+    a = np.full(3, 2.)
+    b = np.full(3, 5.)
+
+    async def serve(sess):
+        return await asyncio.gather(
+            sess.run_async(first, {x: a}), sess.run_async(second, {x: b}))
+
+    with ad.Session() as sess:
+        for _ in range(30):
+            value_first, value_second = asyncio.run(serve(sess))
+            assert np.allclose(value_first, 2 * np.log(a))
+            assert np.allclose(value_second, 3 * np.log(b))
+    # fed values stay in the runs
+    assert x.value is None
+
+    value, tangent = ad.forward.jvp(first, x, np.ones(3), {x: a})
+    assert np.allclose(tangent, 2 / a)
+    value, grads = ad.checkpoint.checkpointed_grad(first, [x], {x: b})
+    assert np.allclose(grads[0], 2 / b)
+
+
+def test_session_memory_planning():
+    x = ad.variable(np.linspace(1., 2., 6).reshape(2, 3), 'x')
+    b = ad.variable(np.array([0.5, 1., 1.5]), 'b')
+    x_value = x.value.copy()
+    hidden = ad.log(ad.add(ad.mul(x, x), b))
+    middle = ad.div(ad.minus(hidden, b), ad.pow(x, ad.constant(2.)))
+    root = ad.add(ad.neg(middle), hidden, x)
+
+    with ad.Session() as sess:
+        expected = np.array(sess.run(root).value)
+    middle.value = None
+
+    with ad.Session(memory_planning=True) as sess:
+        assert np.allclose(sess.run(root).value, expected)
+        tape = sess.graph.tape
+        assert tape.buffers_reused > 0
+        # leaves untouched, intermediates not written back
+        assert np.array_equal(x.value, x_value)
+        assert middle.value is None
+
+        x.value = x.value * 2
+        with ad.Session() as plain:
+            expected = np.array(plain.run(root).value)
+        assert np.allclose(sess.run(root).value, expected)
+
+    with pytest.raises(ValueError):
+        ad.Session(memory_planning=True, num_threads=2)
+    with pytest.raises(ValueError):
+        ad.Session(memory_planning=True, profiler=ad.Profiler())
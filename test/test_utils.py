@@ -1,3 +1,4 @@
+import numpy as np
 import ad
 
 
@@ -38,3 +39,12 @@ def test_flatten_iterable():
 
     for item in flatten_iterable:
         assert item in [1, 2, 3, 5, 6, 7]
+
+
+def test_unbroadcast():
+    value = np.ones((4, 2, 3))
+    assert ad.utils.unbroadcast(value, (4, 2, 3)) is value
+    assert np.array_equal(ad.utils.unbroadcast(value, (3,)), [8, 8, 8])
+    assert ad.utils.unbroadcast(value, (2, 1)).shape == (2, 1)
+    assert ad.utils.unbroadcast(value, ()) == 24
+    assert np.array_equal(ad.utils.unbroadcast(1, (3,)), [1, 1, 1])